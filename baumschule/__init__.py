@@ -15,13 +15,14 @@ from .core.spaces import (
 
 
 from .core.simplify import simplify
-from .core.random_variables import sample
-from .core.computing_engine import compute
-from .core.iterators import iter_instances
-from .core.serialize import serialize, pprint , pformat
-from .core.to_graphviz import todot
+from .core.random_variables import sample, compile_sampler
+from .core.computing_engine import (
+    compute, ThreadPoolEngine, ProcessPoolEngine, CachingEngine)
+from .core.iterators import iter_instances, cardinality, log_cardinality
+from .core.serialize import serialize, parse, pprint , pformat
 from .core.minimizer import minimize, minimize_func
 from .core.space_utils import to_space, is_recursive
+from .core.hashing import structural_eq, interning, enable_interning
 from .data_access import data_access as da
 convert = to_space
 
@@ -34,3 +35,29 @@ def load(filename):
 cont = Continuous
 disc = Discrete
 catg = Categorical
+
+__all__ = [
+    'get_config', 'get_env',
+    'R', 'N', 'N0', 'Z', 'Interval', 'ParameterList',
+    'Categorical', 'Discrete', 'Continuous', 'Apply', 'operation', 'op',
+    'join', 'intersect', 'power', 'prod', 'quote',
+    'simplify', 'sample', 'compile_sampler',
+    'compute', 'ThreadPoolEngine', 'ProcessPoolEngine', 'CachingEngine',
+    'iter_instances', 'cardinality', 'log_cardinality',
+    'serialize', 'parse', 'pprint', 'pformat', 'minimize', 'minimize_func',
+    'to_space', 'is_recursive', 'structural_eq', 'interning',
+    'enable_interning', 'da', 'convert',
+    'add', 'mul', 'pow', 'div', 'sub', 'floordiv', 'truediv',
+    'list_op', 'tuple_op', 'dict_op', 'set_op',
+    'load', 'cont', 'disc', 'catg', 'todot',
+]
+
+
+def __getattr__(name):
+    # to_graphviz is imported on first access of todot, graphviz on its
+    # first call
+    if name == 'todot':
+        from .core.to_graphviz import todot
+        return todot
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name))
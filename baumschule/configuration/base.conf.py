@@ -10,11 +10,11 @@ c.protocol_path = join(c.base_path, 'protocol')
 c.env_path = join(c.base_path, 'environment')
 
 
-from baumschule.minimizers import *
+# minimizers given by their dotted path are imported on first use
 c.minimizers = {
-    'flatgp' : FlatGPMinimizer,
-    'random' : RandomMinimizer,
-    'exhaustive' : ExhaustiveMinimizer,
-    'treegp' : TreeGPMinimizer,
-    'default' : RandomMinimizer,
+    'flatgp' : 'baumschule.minimizers.flatgp.FlatGPMinimizer',
+    'random' : 'baumschule.minimizers.simple.RandomMinimizer',
+    'exhaustive' : 'baumschule.minimizers.simple.ExhaustiveMinimizer',
+    'treegp' : 'baumschule.minimizers.treegp.TreeGPMinimizer',
+    'default' : 'baumschule.minimizers.simple.RandomMinimizer',
 }
@@ -19,24 +19,19 @@ c.datasets.local_default_source = 'local'
 c.datasets.local_group_classes = {
 }
 
-import pandas, numpy, scipy
-
-# maps from a mime type to function
-# that reads a file on the local file system
+# maps from a mime type to function (or its dotted path, imported
+# when first used) that reads a file on the local file system
 c.datasets.local_read_functions = {
-    'text/csv' : pandas.read_csv,
-    'text/tab-separated-values' : pandas.read_table,
-    'application/x-numpy-data' : numpy.load,
-    'application/x-matlab-data' : scipy.io.loadmat,
+    'text/csv' : 'pandas.read_csv',
+    'text/tab-separated-values' : 'pandas.read_table',
+    'application/x-numpy-data' : 'numpy.load',
+    'application/x-matlab-data' : 'scipy.io.loadmat',
 }
 
-
-def df_to_csv(path, df):
-	import pandas
-	pandas.DataFrame.to_csv(df, path)
-
-# maps from a object type to write function
+# maps from a object type to write function, types and functions can
+# be given by their dotted path, types of modules that are not imported
+# yet are skipped (no object can have them)
 c.datasets.local_write_functions = {
-    numpy.ndarray : numpy.save,
-    pandas.DataFrame : df_to_csv,
+    'numpy.ndarray' : 'numpy.save',
+    'pandas.DataFrame' : 'baumschule.data_access.utils.write_csv',
 }
@@ -1,15 +1,66 @@
-from .domains import ParameterList
-from .spaces import Apply, quote, prod, Operation, power, Combination
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
+from keyword import iskeyword
+import threading
+import logging
+import pickle
+import shelve
+
+import numpy as np
+
+from .domains import ParameterList, Interval, EMPTY_KWARGS
+from .spaces import (
+    Apply, quote, prod, Operation, power, Combination, Parameter, Primitive)
 from .serialize import serialize
+from .space_utils import get_cached, peek_cached
+from .hashing import structural_hash
+from .traversal import fold
+from .environment import share_config, unshare_config, restore_config
+from .utils import CodeWriter
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+log.setLevel('INFO')
+
 
 class ComputingEngine:
     def evaluate(self, computation_graph):
         raise NotImplementedError()
 
+    def submit(self, computation_graph):
+        """
+        Returns a concurrent.futures.Future of the result.
+
+        Engines without a pool evaluate immediately.
+        """
+        future = Future()
+        try:
+            future.set_result(self.evaluate(computation_graph))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def evaluate_batch(self, computation_graphs):
+        """Evaluates several graphs, results are in submission order."""
+        futures = [self.submit(graph) for graph in computation_graphs]
+        return [future.result() for future in futures]
+
+    def compile(self, tree):
+        """
+        Returns a function that evaluates instances of tree.
+
+        Engines without a compiler just evaluate (see SimpleEngine.compile).
+        """
+        return self.evaluate
+
 
 class SimpleEngine(ComputingEngine):
 
     def evaluate(self, func_tree):
+        return fold(func_tree, self._evaluate_node, _evaluation_children)
+
+    def _evaluate_node(self, func_tree, results):
+        """Evaluates a node given the results of _evaluation_children."""
         # assume simple operators for now
 
         # only function application can be evaluated
@@ -20,12 +71,12 @@ class SimpleEngine(ComputingEngine):
         if func_tree.operation == quote:
             return func_tree.domain
 
-        # evaluate operation
+        # evaluated operations are applied to the unevaluated domain
         if type(func_tree.operation) == Apply:
-            op = self.evaluate(func_tree.operation)
-        else:
-            op = func_tree.operation
-            
+            op, = results
+            return self.evaluate(Apply._make(op, func_tree.domain))
+
+        op = func_tree.operation
         dom = func_tree.domain
 
         # combination are evaluated from ouside to inside
@@ -34,33 +85,428 @@ class SimpleEngine(ComputingEngine):
             comb = op.func(
                 *dom.args,
                 **dom.kwargs)
-            result = self.evaluate(comb)
-        else:
-            plist = ParameterList([], {})
-            for key, val in func_tree.domain.items():
-                val = self.evaluate(val)
-                if type(key) == int:
-                    if type(val) is ParameterList:
-                        plist.update(val, overwrite=False)
-                    else:
-                        plist.append(val)
-                elif type(key) == str:
-                    assert key not in plist.keys()
-                    plist[key] = val
+            return self.evaluate(comb)
+
+        plist = ParameterList([], {})
+        for key, val in zip(dom.keys(), results):
+            if type(key) == int:
+                if isinstance(val, ParameterList):
+                    plist.update(val, overwrite=False)
                 else:
-                    raise KeyError(
-                    'Only str and int allowed as keys! type: %s' % type(key))
+                    plist.append(val)
+            elif type(key) == str:
+                assert key not in plist.kwargs
+                plist[key] = val
+            else:
+                raise KeyError(
+                'Only str and int allowed as keys! type: %s' % type(key))
+
+        if type(op) == Operation:
+            func = op.func
+        else:
+            func = op
+
+        return func(
+            *plist.args,
+            **plist.kwargs)
+
+    def compile(self, tree):
+        """
+        Returns a Plan that evaluates tree or instances of it.
+
+        tree can be a search space, its plan evaluates all instances
+        sampled or iterated from it.
+        """
+        return Plan(tree, self)
+
+
+class Plan:
+    """
+    Evaluation of a tree compiled into one Python function.
+
+    The function is a flat list of statements in evaluation order: read
+    the leaf values of the instance and call the (already resolved)
+    operation functions. Instances of a search space have the structure
+    of the space, except at choice points. Those (join, primitives) and
+    nodes that can't be compiled (quote, combinations, operations given
+    by parameters) are evaluated by the engine at runtime.
+    """
+
+    def __init__(self, tree, engine):
+        self.tree = tree
+        self.engine = engine
+        writer = _PlanWriter()
+        result, _ = writer.emit(tree, 'node', ())
+        self.source = writer.source(result)
+
+        namespace = dict(writer.constants)
+        namespace.update(
+            _evaluate = engine.evaluate,
+            _args = _splat_args,
+            _kwargs = _splat_kwargs)
+        exec(self.source, namespace)
+        self.func = namespace['plan']
 
-            if type(op) == Operation:
-                func = op.func
+    def __call__(self, instance=None):
+        if instance is None:
+            instance = self.tree
+        return self.func(instance)
+
+    def __reduce__(self):
+        return Plan, (self.tree, self.engine)
+
+
+class _PlanWriter(CodeWriter):
+    """Generates the source of a Plan."""
+
+    constant_prefix = 'f'
+
+    def source(self, result):
+        body = self.lines + ['return %s' % result]
+        return self.function_source('plan', 'node', body)
+
+    def emit(self, node, access, parents):
+        """
+        Writes the statements for node at access, returns the expression
+        of its value and whether it may be a ParameterList, whose items
+        are spliced into the arguments like SimpleEngine does.
+        """
+        if not isinstance(node, Parameter):
+            return access, isinstance(node, ParameterList)
+
+        if isinstance(node, Primitive) and _plain_values(node.domain):
+            return access, False
+
+        operation = getattr(node, 'operation', None)
+        if (type(node) is not Apply
+                or isinstance(operation, (Parameter, Combination))
+                or operation == quote
+                or any(node is p for p in parents)):
+            return '_evaluate(%s)' % access, True
+
+        func = operation.func if type(operation) is Operation else operation
+        dom = self.name('d')
+        self.lines.append('%s = %s.domain' % (dom, access))
+        parents += (node,)
+
+        args, kwargs = [], []
+        for i, value in enumerate(node.domain.args):
+            expr, splice = self.emit(value, '%s.args[%s]' % (dom, i), parents)
+            if splice:
+                var = expr
+                if not expr.isidentifier():
+                    var = self.name('v')
+                    self.lines.append('%s = %s' % (var, expr))
+                args.append('*_args(%s)' % var)
+                kwargs.append('**_kwargs(%s)' % var)
             else:
-                func = op
+                args.append(expr)
+        for key, value in node.domain.kwargs.items():
+            expr, _ = self.emit(value, '%s.kwargs[%r]' % (dom, key), parents)
+            if key.isidentifier() and not iskeyword(key):
+                kwargs.append('%s=%s' % (key, expr))
+            else:
+                kwargs.append('**{%r: %s}' % (key, expr))
+
+        result = self.name('r')
+        self.lines.append('%s = %s(%s)' % (
+            result, self.constant(func), ', '.join(args + kwargs)))
+        return result, True
+
+
+def _evaluation_children(func_tree):
+    """Subexpressions evaluated before func_tree."""
+    if type(func_tree) is not Apply:
+        return ()
+    op = func_tree.operation
+    if op == quote or type(op) == Combination:
+        return ()
+    if type(op) == Apply:
+        return (op,)
+    dom = func_tree.domain
+    return tuple(dom.values())
+
+
+def _plain_values(domain):
+    """Whether the values of a domain are evaluated to themselves."""
+    if isinstance(domain, Interval):
+        return True
+    return not any(
+        isinstance(v, (Parameter, ParameterList)) for v in domain)
+
+
+def _splat_args(value):
+    if isinstance(value, ParameterList):
+        return value.args
+    return (value,)
+
+
+def _splat_kwargs(value):
+    if isinstance(value, ParameterList):
+        return value.kwargs
+    return EMPTY_KWARGS
+
+
+class PoolEngine(ComputingEngine):
+    """
+    Evaluates computation graphs concurrently in an executor pool.
+
+    The actual evaluation is delegated to engine (default SimpleEngine).
+    The pool is created on first use, use shutdown() or a with-statement
+    to release the workers.
+    """
+
+    executor_cls = None
+
+    def __init__(self, max_workers=None, engine=None):
+        if engine is None:
+            engine = SimpleEngine()
+        self.engine = engine
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = self.executor_cls(
+                max_workers=self.max_workers, **self._executor_kwargs())
+        return self._executor
+
+    def _executor_kwargs(self):
+        return {}
+
+    def evaluate(self, func_tree):
+        return self.submit(func_tree).result()
+
+    def submit(self, func_tree):
+        return self.executor.submit(self.engine.evaluate, func_tree)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class ThreadPoolEngine(PoolEngine):
+    """
+    Evaluates in a thread pool.
+
+    Only useful for operations that release the GIL (numpy, I/O, ...).
+    """
+    executor_cls = ThreadPoolExecutor
+
+
+class ProcessPoolEngine(PoolEngine):
+    """
+    Evaluates in a pool of worker processes.
+
+    Instances and results are pickled. Builtin and environment operations
+    are pickled by name, other operations need a function that can be
+    imported by the workers (i.e. no lambdas or closures).
+
+    The configuration of this process is passed to the workers by value,
+    so they see changes made to it after import and don't execute the
+    configuration files again (see environment.share_config). It is
+    shared until shutdown.
+    """
+
+    @property
+    def executor_cls(self):
+        # multiprocessing is imported on first use
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor
+
+    def _executor_kwargs(self):
+        return dict(initializer=restore_config, initargs=(share_config(),))
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            unshare_config()
+        super().shutdown(wait=wait)
+
+
+class EvaluationCache:
+    """
+    Least recently used cache of evaluation results, keyed by the
+    structural hashes of the expressions.
+
+    maxsize : int
+        number of results kept in memory
+    path : str
+        optional shelve file, all results are also written there and found
+        again after they were evicted from memory or in a later session
+        (not safe for several processes)
+    """
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._shelf = None
+
+    @property
+    def shelf(self):
+        if self._shelf is None and self.path is not None:
+            self._shelf = shelve.open(self.path)
+        return self._shelf
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value = self._memory[key]
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            except KeyError:
+                pass
+            if self.shelf is not None:
+                try:
+                    value = self.shelf[key.hex()]
+                except KeyError:
+                    pass
+                else:
+                    self.hits += 1
+                    self._store(key, value)
+                    return value
+            self.misses += 1
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._store(key, value)
+            if self.shelf is not None:
+                try:
+                    self.shelf[key.hex()] = value
+                except (pickle.PicklingError, TypeError, AttributeError) as e:
+                    log.debug('result not stored on disk: %s' % e)
+
+    def _store(self, key, value):
+        memory = self._memory
+        memory[key] = value
+        memory.move_to_end(key)
+        while len(memory) > self.maxsize:
+            memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.shelf is not None:
+                self.shelf.clear()
+
+    def close(self):
+        if self._shelf is not None:
+            self._shelf.close()
+            self._shelf = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_shelf'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class CachingEngine(SimpleEngine):
+    """
+    Evaluates like SimpleEngine, but looks up results in a cache first.
+
+    Every sub-expression that only uses pure operations (see Operation)
+    is cached, so identical instances and shared sub-expressions are
+    computed once. Cached results are shared, they must not be mutated.
+    If engine is given (e.g. a pool engine), only whole instances are
+    cached and misses are delegated to it.
+    """
+
+    def __init__(self, cache=None, engine=None):
+        if cache is None:
+            cache = EvaluationCache()
+        self.cache = cache
+        self.engine = engine
+
+    def evaluate(self, func_tree):
+        if self.engine is not None:
+            return self.submit(func_tree).result()
+
+        return fold(func_tree, self._evaluate_node, _evaluation_children,
+            memo=self.cache, key=self.key)
+
+    def submit(self, func_tree):
+        if self.engine is None:
+            return super().submit(func_tree)
+
+        key = self.key(func_tree)
+        if key is not None:
+            try:
+                future = Future()
+                future.set_result(self.cache[key])
+                return future
+            except KeyError:
+                pass
+
+        future = self.engine.submit(func_tree)
+        if key is not None:
+            def store(future):
+                if future.exception() is None:
+                    self.cache[key] = future.result()
+            future.add_done_callback(store)
+        return future
+
+    compile = ComputingEngine.compile
+
+    @staticmethod
+    def key(func_tree):
+        """Returns the cache key of an expression, None if not cached."""
+        if type(func_tree) is not Apply or func_tree.operation == quote:
+            return None
+        return evaluation_key(func_tree)
+
+
+def evaluation_key(func_tree):
+    """
+    Returns the structural hash of an expression, None if it contains
+    impure operations.
+    """
+    if not get_cached(func_tree, 'pure', _is_pure):
+        return None
+    return structural_hash(func_tree)
+
+
+def _is_pure(func_tree):
+    """Whether an expression contains only pure operations."""
+    return fold(func_tree, _visit_pure, _pure_children, cycle=lambda _ : True)
+
+
+def _pure_children(value):
+    if type(value) is not Apply or peek_cached(value, 'pure') is not None:
+        return ()
+    return (value.operation, *value.domain.values())
 
-            result = func(
-                *plist.args,
-                **plist.kwargs)
 
-        return result
+def _visit_pure(value, results):
+    if isinstance(value, Operation):
+        return value.pure
+    if type(value) is not Apply:
+        return True
+    if not results:
+        return peek_cached(value, 'pure')
+    pure = all(results)
+    get_cached(value, 'pure', lambda _ : pure)
+    return pure
 
 
 compute = SimpleEngine().evaluate
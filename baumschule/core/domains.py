@@ -1,6 +1,13 @@
-from math import inf
+from math import inf, lcm
+from types import MappingProxyType
+
+import numpy as np
+
+from .utils import divisible, decimal_fraction
+
+# shared by all parameter lists without keyword arguments
+EMPTY_KWARGS = MappingProxyType({})
 
-from .utils import divisible
 
 class ParameterList:
     """
@@ -9,9 +16,20 @@ class ParameterList:
     keeps order
     """
 
+    __slots__ = ('args', 'kwargs')
+
     def __init__(self, args, kwargs):
         self.args = list(args)
-        self.kwargs = dict(kwargs)
+        kwargs = dict(kwargs)
+        self.kwargs = kwargs if kwargs else EMPTY_KWARGS
+
+    @classmethod
+    def _make(cls, args, kwargs):
+        """Creates a ParameterList from a list and a dict without copying."""
+        self = cls.__new__(cls)
+        self.args = args
+        self.kwargs = kwargs
+        return self
 
     def keys(self):
         yield from range(len(self.args))
@@ -26,6 +44,15 @@ class ParameterList:
         yield from enumerate(self.args)
         yield from sorted(self.kwargs.items())
 
+    def __reduce__(self):
+        return type(self), (self.args, dict(self.kwargs))
+
+    def _writable_kwargs(self):
+        # the dict is created on the first keyword argument
+        if self.kwargs is EMPTY_KWARGS:
+            self.kwargs = {}
+        return self.kwargs
+
     def append(self, value):
         self.args.append(value)
 
@@ -49,7 +76,8 @@ class ParameterList:
                 'Parameterlists with common keyword argument cannot be combined'
 
             self.extend(args)
-            self.kwargs.update(kwargs)
+            if kwargs:
+                self._writable_kwargs().update(kwargs)
 
         else:
             raise NotImplementedError()
@@ -110,7 +138,7 @@ class ParameterList:
         if type(key) == int:
             self.args[key] = val
         elif type(key) == str:
-            self.kwargs[key] = val
+            self._writable_kwargs()[key] = val
         else:
             raise ValueError('Only str and int are valied keys.')
 
@@ -129,16 +157,40 @@ class ParameterList:
         return '%s(%s)' % (self.__class__.__name__, params)"""
 
     def __lshift__(self, arg):
-        if type(arg) == ParameterList:
+        if isinstance(arg, ParameterList):
             self.extend(arg.args)
             self.update(arg.kwargs, overwrite=False)
         else:
             self.append(arg)
 
 
+class FrozenParameterList(ParameterList):
+    """
+    Immutable ParameterList with a tuple of arguments, used for sampled
+    instances.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, args, kwargs):
+        self.args = tuple(args)
+        kwargs = dict(kwargs)
+        self.kwargs = MappingProxyType(kwargs) if kwargs else EMPTY_KWARGS
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(
+            'FrozenParameterList cannot be changed, sampled instances are '
+            'immutable (copy the domain into a ParameterList)')
+
+    append = extend = update = __setitem__ = __lshift__ = _immutable
+
+
 class Interval:
     """Used to represent a discrete or continous range of values."""
 
+    __slots__ = (
+        'start', 'stop', 'step', 'left_closed', 'right_closed', '_grid_cache')
+
     def __init__(self, start, stop, step, left_closed=True, right_closed=False):
         assert start < stop
         assert step >= 0
@@ -148,6 +200,19 @@ class Interval:
         self.left_closed = left_closed
         self.right_closed = right_closed
 
+    def _key(self):
+        return (
+            self.start, self.stop, self.step,
+            self.left_closed, self.right_closed)
+
+    def __eq__(self, other):
+        if type(other) is not Interval:
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
     @property
     def bounded(self):
         return self.start > -inf and self.stop < inf
@@ -156,41 +221,82 @@ class Interval:
     def closed(self):
         return self.left_closed or self.right_closed
 
+    @property
+    def grid(self):
+        """The Grid of a discrete interval, computed once."""
+        try:
+            return self._grid_cache
+        except AttributeError:
+            if not self.step:
+                raise ValueError('Continuous interval has no grid.')
+            self._grid_cache = Grid(self)
+            return self._grid_cache
+
     def __contains__(self, arg):
         start, stop, step = self.start, self.stop, self.step
 
         if isinstance(arg, (int, float)):
+            if step:
+                return self.grid.index(arg) is not None
             if not (start <= arg <= stop):
                 return False
-            if arg == start :
-                return self.left_closed
-            if arg == stop and not self.right_closed:
-                return False
-            if step == 0:
-                return True
-            return divisible(arg - start, step)
+            if arg == start:
+                return bool(self.left_closed)
+            if arg == stop:
+                return bool(self.right_closed)
+            return True
 
-        if isinstance(arg, Intervall):
+        if isinstance(arg, Interval):
             if not (arg.start in self and arg.stop in self):
                 return False
             if step == 0:
                 return True
             if arg.step < step:
                 return False
-            raise NotImplementedError()
+            return divisible(arg.step, step) and self.grid.on_grid(arg.start)
 
         return False
 
+    def contains_many(self, values):
+        """Boolean array, whether each of values is in the interval."""
+        x = np.asarray(values, dtype=float)
+        if self.step:
+            return self.grid.indices(x)[1]
+        inside = (self.start < x) & (x < self.stop)
+        if self.left_closed:
+            inside |= x == self.start
+        if self.right_closed:
+            inside |= x == self.stop
+        return inside
+
+    def snap(self, values):
+        """
+        Rounds values to the nearest grid points, or clips them to the
+        bounds of a continuous interval. Returns a number for a number.
+        """
+        x = np.asarray(values, dtype=float)
+        if self.step:
+            snapped = self.grid.snap(x)
+        else:
+            snapped = np.clip(x, self.start, self.stop)
+        return snapped.item() if snapped.ndim == 0 else snapped
+
     def __getitem__(self, key):
-        # TODO: make step actually more meaningfull
+        """
+        The k-th value of a discrete interval for an int, a sub-interval for
+        a slice. Discrete sub-intervals include start and exclude stop like
+        ranges, e.g. N[0:5] has the values 0 to 4.
+        """
+        if type(key) is int:
+            return self._value(key)
         if not type(key) is slice:
             raise KeyError(key)
 
         start = self.start if key.start is None else key.start
         stop = self.stop if key.stop is None else key.stop
         step = self.step if key.step is None else key.step
-        left_closed = False if start == -inf else self.step or self.left_closed
-        right_closed = False if stop == inf else self.step or self.right_closed
+        left_closed = False if start == -inf else bool(self.step or self.left_closed)
+        right_closed = False if stop == inf else self.right_closed
 
         # check types
         for s in (start, stop, step):
@@ -200,31 +306,54 @@ class Interval:
         return Interval(
             start, stop, step, left_closed, right_closed)
 
-    def __iter__(self):
+    def _value(self, k):
+        grid = self._iterable_grid()
+        n = len(grid)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError('Interval index out of range')
+        return grid.value(grid.first + k)
+
+    def _iterable_grid(self):
         if self.step == 0:
             raise NotIterableError('Continuous interval cannot be iterated.')
         if not self.bounded:
             raise Warning('Iteration of infinite %s will take forever.' % self)
-            raise NotImplementedError()
+        return self.grid
 
-        if self.left_closed:
-            yield self.start
-
-        values = iter(range(self.start, self.stop, self.step))
-        next(values) # skip start value
-        for val in values:
-            yield val
-
-        # how to avoid floating point arithmetics erros here
-        if self.left_closed and val + self.step == self.stop:
-            return self.stop
+    def __iter__(self):
+        # values are computed from their index, no rounding errors add up
+        grid = self._iterable_grid()
+        if grid.integral:
+            return iter(range(
+                grid.value(grid.first), grid.value(grid.last) + 1, grid.step))
+        return map(grid.value, range(grid.first, grid.last + 1))
+
+    def index_of(self, value):
+        """The position of value in the iteration order."""
+        k = self._iterable_grid().index(value)
+        if k is None:
+            raise ValueError('%s is not in %s' % (value, self))
+        return k - self.grid.first
 
     def len(self):
-        # TODO check for one element intervals
         if self.step == 0 or not self.bounded:
             return inf
-        bounds = self.left_closed + self.right_closed
-        return self.stop - self.start - bounds
+        return len(self.grid)
+
+    def __array__(self, dtype=None, copy=None):
+        """
+        The values of a discrete interval. The array is computed once and
+        shared, it is read-only.
+        """
+        grid = self._iterable_grid()
+        if grid.array is None:
+            grid.array = grid.values(np.arange(grid.first, grid.last + 1))
+            grid.array.flags.writeable = False
+        if dtype is not None or copy:
+            return np.array(grid.array, dtype=dtype, copy=True)
+        return grid.array
 
     def __str__(self):
         # return 'Interval(%s, %s, %s)' % (self.start, self.stop, self.type_)
@@ -240,6 +369,102 @@ class Interval:
         )
 
 
+class Grid:
+    """
+    The points anchor + k * step of a discrete interval, with indices k
+    from first to last (None if unbounded).
+
+    anchor and step are scaled to integers by the common denominator of
+    the decimal numbers they are printed as (see decimal_fraction), so
+    the point with index k is computed exactly as (anchor + k*step)/scale,
+    for floats correctly rounded. The anchor is start, or stop or 0 for
+    unbounded intervals.
+    """
+
+    __slots__ = (
+        'anchor', 'step', 'scale', 'first', 'last', 'integral', 'array')
+
+    def __init__(self, interval):
+        start, stop = interval.start, interval.stop
+        origin = start if start > -inf else (stop if stop < inf else 0)
+        anchor = decimal_fraction(origin)
+        step = decimal_fraction(interval.step)
+        scale = lcm(anchor.denominator, step.denominator)
+        self.anchor = int(anchor * scale)
+        self.step = int(step * scale)
+        self.scale = scale
+        self.integral = type(origin) is int and type(interval.step) is int
+
+        self.array = None
+        self.first = self.last = None
+        if start > -inf:
+            self.first = 0 if interval.left_closed else 1
+        if stop < inf:
+            last, rest = divmod(decimal_fraction(stop) * scale - self.anchor, self.step)
+            if rest == 0 and not interval.right_closed:
+                last -= 1
+            self.last = int(last)
+
+    def __len__(self):
+        if self.first is None or self.last is None:
+            raise OverflowError('unbounded grid')
+        return max(self.last - self.first + 1, 0)
+
+    def value(self, k):
+        """The point with index k."""
+        if self.integral:
+            return self.anchor + k * self.step
+        return (self.anchor + k * self.step) / self.scale
+
+    def on_grid(self, x):
+        """Whether x is a grid point, bounds are not checked."""
+        return self._nearest(x) is not None
+
+    def index(self, x):
+        """The index of the point x, None if x is no point in bounds."""
+        k = self._nearest(x)
+        if k is None:
+            return None
+        if self.first is not None and k < self.first:
+            return None
+        if self.last is not None and k > self.last:
+            return None
+        return k
+
+    def _nearest(self, x):
+        if type(x) is int:
+            k, rest = divmod(x * self.scale - self.anchor, self.step)
+            return k if rest == 0 else None
+        if x != x or x in (inf, -inf):
+            return None
+        k = round((x * self.scale - self.anchor) / self.step)
+        return k if self.value(k) == x else None
+
+    def _clip(self, k):
+        if self.first is not None or self.last is not None:
+            return np.clip(k, self.first, self.last)
+        return k
+
+    def values(self, k):
+        """The points of an array of indices."""
+        if self.integral:
+            return self.anchor + k.astype(int) * self.step
+        # exact as long as the numerators are below 2**53
+        return (float(self.anchor) + k * float(self.step)) / self.scale
+
+    def indices(self, x):
+        """The nearest indices of an array and whether they are x."""
+        k = np.rint((x * self.scale - self.anchor) / self.step)
+        with np.errstate(invalid='ignore'):
+            found = (self.values(np.nan_to_num(k)) == x) & np.isfinite(x)
+        return k, found & (self._clip(k) == k)
+
+    def snap(self, x):
+        """The nearest points of an array within bounds."""
+        k = np.rint((x * self.scale - self.anchor) / self.step)
+        return self.values(self._clip(k))
+
+
 # --------------- Predifined Domains ---------------------------------------- #
 
 N = Interval(
@@ -0,0 +1,329 @@
+"""
+Numeric encoding of the instances of flat search spaces.
+
+The choice points of the crown (see space_utils.get_crown) are mapped to
+the columns of a float matrix: categories are one-hot coded, joins by the
+index of the chosen child, discrete and continuous values as numbers.
+Bounded intervals are optionally scaled to [0, 1].
+"""
+from math import inf
+
+import numpy as np
+
+from .domains import Interval, ParameterList
+from .spaces import (
+    Apply, Categorical, Discrete, Continuous, Parameter, Primitive, join)
+from .space_utils import get_crown
+from .hashing import structural_eq
+from .random_variables import sample, _object_array
+from .utils import CodeWriter
+
+
+class Encoding:
+    """
+    Encodes instances of a search space as rows of a matrix and decodes
+    (relaxed) rows to the nearest valid instances.
+
+    Reading the choice points of an instance and building an instance
+    from values are compiled into one Python function each, the columns
+    are encoded and decoded for a whole batch at once.
+
+    scale : bool
+        scale bounded discrete and continuous values to [0, 1]
+    """
+
+    def __init__(self, search_space, scale=False):
+        self.search_space = search_space
+        self.scale = scale
+        self.crown, self.crown_indices = get_crown(
+            search_space, include_primitives=True)
+
+        self.columns = []
+        offset = 0
+        for subspace in self.crown:
+            column = _column(subspace, offset, scale)
+            self.columns.append(column)
+            offset += column.width
+        self.width = offset
+
+        positions = {index : i for i, index in enumerate(self.crown_indices)}
+        prefixes = {
+            index[:i] for index in self.crown_indices
+            for i in range(len(index))}
+        self._extract = _compile(_ExtractWriter(positions, prefixes), search_space)
+        self._build = _compile(_BuildWriter(positions, prefixes), search_space)
+
+    def encode(self, instances):
+        """Returns the matrix of a list of instances."""
+        rows = [self._extract(x) for x in instances]
+        X = np.zeros((len(rows), self.width))
+        for values, column in zip(zip(*rows), self.columns):
+            column.encode(values, X[:, column.offset:column.offset + column.width])
+        return X
+
+    def decode(self, X):
+        """Returns the nearest instance for each row of X."""
+        X = np.asarray(X, dtype=float).reshape(-1, self.width)
+        if not self.columns:
+            return [self._build(())] * len(X)
+        values = [
+            column.decode(X[:, column.offset:column.offset + column.width])
+            for column in self.columns]
+        return [self._build(row) for row in zip(*values)]
+
+    def bounds(self):
+        """Returns (lower, upper) for each column, None if unbounded."""
+        bounds = []
+        for column in self.columns:
+            bounds.extend(column.bounds())
+        return bounds
+
+
+# ---------------------------- columns -------------------------------------- #
+
+def _column(space, offset, scale):
+    if type(space) is Categorical:
+        return _OneHot(space, offset)
+    if type(space) is Apply and space.operation == join:
+        return _Choice(space, offset)
+    if type(space) in (Discrete, Continuous):
+        if isinstance(space.domain, Interval):
+            return _Numeric(space, offset, scale)
+        if type(space) is Discrete:
+            return _Nearest(space, offset)
+    raise TypeError('No numeric encoding for %s' % space)
+
+
+class _Column:
+
+    width = 1
+
+    def __init__(self, space, offset):
+        self.space = space
+        self.offset = offset
+
+
+class _OneHot(_Column):
+    """Categories as one-hot vectors."""
+
+    def __init__(self, space, offset):
+        super().__init__(space, offset)
+        self.values = list(space.domain)
+        self.width = len(self.values)
+        self.lookup = _object_array(self.values)
+        try:
+            self.index = {v : i for i, v in enumerate(self.values)}
+        except TypeError: # unhashable categories
+            self.index = None
+
+    def _position(self, value):
+        if self.index is not None:
+            try:
+                return self.index[value]
+            except (KeyError, TypeError):
+                pass
+        return self.values.index(value)
+
+    def encode(self, values, out):
+        positions = [self._position(v) for v in values]
+        out[np.arange(len(values)), positions] = 1
+
+    def decode(self, block):
+        return list(self.lookup[np.argmax(block, axis=1)])
+
+    def bounds(self):
+        return [(0, 1)] * self.width
+
+
+class _Choice(_Column):
+    """
+    The index of the chosen child of a join. Children with choice points
+    are decoded to a sample of the child.
+    """
+
+    def __init__(self, space, offset):
+        super().__init__(space, offset)
+        self.children = _object_array(space.domain.values())
+
+    def _position(self, value):
+        for i, child in enumerate(self.children):
+            if _matches(value, child):
+                return i
+        raise ValueError('%s is no instance of %s' % (value, self.space))
+
+    def encode(self, values, out):
+        out[:, 0] = [self._position(v) for v in values]
+
+    def decode(self, block):
+        k = np.clip(np.rint(block[:, 0]), 0, len(self.children) - 1)
+        return [
+            sample(child) if isinstance(child, Parameter) else child
+            for child in self.children[k.astype(int)]]
+
+    def bounds(self):
+        return [(0, len(self.children) - 1)]
+
+
+def _matches(value, space):
+    """Whether value is an instance of space."""
+    if isinstance(space, Primitive):
+        if isinstance(value, Parameter):
+            return False
+        try:
+            return value in space.domain
+        except TypeError: # unhashable value
+            return False
+    if type(space) is Apply:
+        if space.operation == join:
+            return any(_matches(value, child) for child in space.domain)
+        if type(value) is not Apply:
+            return False
+        dom, space_dom = value.domain, space.domain
+        return (
+            len(dom.args) == len(space_dom.args)
+            and dom.kwargs.keys() == space_dom.kwargs.keys()
+            and _matches(value.operation, space.operation)
+            and all(map(_matches, dom, space_dom)))
+    return structural_eq(value, space)
+
+
+class _Numeric(_Column):
+    """Values of an interval, decoded to the nearest valid value."""
+
+    def __init__(self, space, offset, scale):
+        super().__init__(space, offset)
+        dom = space.domain
+        self.origin, self.span = 0.0, 1.0
+        if scale and dom.bounded:
+            self.origin, self.span = dom.start, dom.stop - dom.start
+        self.scaled = scale and dom.bounded
+
+    def encode(self, values, out):
+        out[:, 0] = values
+        if self.scaled:
+            out[:, 0] -= self.origin
+            out[:, 0] /= self.span
+
+    def decode(self, block):
+        values = block[:, 0]
+        if self.scaled:
+            values = values * self.span + self.origin
+        return self.space.domain.snap(values).tolist()
+
+    def bounds(self):
+        if self.scaled:
+            return [(0, 1)]
+        dom = self.space.domain
+        return [(
+            None if dom.start == -inf else dom.start,
+            None if dom.stop == inf else dom.stop)]
+
+
+class _Nearest(_Column):
+    """Discrete values of a set, decoded to the nearest one."""
+
+    def __init__(self, space, offset):
+        super().__init__(space, offset)
+        self.values = np.array(sorted(space.domain))
+
+    def encode(self, values, out):
+        out[:, 0] = values
+
+    def decode(self, block):
+        distances = abs(self.values[None, :] - block[:, :1])
+        return self.values[np.argmin(distances, axis=1)].tolist()
+
+    def bounds(self):
+        return [(self.values[0], self.values[-1])]
+
+
+# -------------------------- compiled access -------------------------------- #
+
+def _compile(writer, search_space):
+    writer.emit(search_space, 'x', ())
+    source = writer.source()
+    namespace = dict(writer.constants)
+    namespace.update(_Apply=Apply, _ParameterList=ParameterList)
+    exec(source, namespace)
+    return namespace['func']
+
+
+class _Writer(CodeWriter):
+
+    def __init__(self, positions, prefixes):
+        super().__init__()
+        self.positions = positions
+        self.prefixes = prefixes
+
+    @staticmethod
+    def children(node):
+        """(crown position, access, is keyword) of the domain values."""
+        dom = node.domain
+        children = [(i, 'args[%s]' % i, False) for i in range(len(dom.args))]
+        children += [
+            (len(dom.args) + i, 'kwargs[%r]' % key, key)
+            for i, key in enumerate(sorted(dom.kwargs))]
+        return children
+
+
+class _ExtractWriter(_Writer):
+    """Reads the values of the choice points of an instance as tuple."""
+
+    def __init__(self, positions, prefixes):
+        super().__init__(positions, prefixes)
+        self.values = []
+
+    def source(self):
+        values = [None] * len(self.positions)
+        for position, expr in self.values:
+            values[position] = expr
+        body = self.lines + ['return (%s)' % ''.join(v + ', ' for v in values)]
+        return self.function_source('func', 'x', body)
+
+    def emit(self, node, access, index):
+        if index in self.positions:
+            self.values.append((self.positions[index], access))
+            return
+        if index not in self.prefixes or type(node) is not Apply:
+            return
+
+        var = access
+        if not access.isidentifier():
+            var = self.name('n')
+            self.lines.append('%s = %s' % (var, access))
+        dom = self.name('d')
+        self.lines.append('%s = %s.domain' % (dom, var))
+        self.emit(node.operation, '%s.operation' % var, (*index, -1))
+        for (i, child_access, _), value in zip(self.children(node), node.domain):
+            self.emit(value, '%s.%s' % (dom, child_access), (*index, i))
+
+
+class _BuildWriter(_Writer):
+    """Builds an instance from the tuple of the choice point values."""
+
+    def source(self):
+        return self.function_source('func', 'v', ['return %s' % self.result])
+
+    def emit(self, node, access, index):
+        expr = self._expr(node, index)
+        if index == ():
+            self.result = expr
+        return expr
+
+    def _expr(self, node, index):
+        if index in self.positions:
+            return 'v[%s]' % self.positions[index]
+        if index not in self.prefixes or type(node) is not Apply:
+            # unchanged subtrees are shared with the search space
+            return self.constant(node)
+
+        op = self._expr(node.operation, (*index, -1))
+        args, kwargs = [], []
+        for (i, _, key), value in zip(self.children(node), node.domain):
+            expr = self._expr(value, (*index, i))
+            if key is False:
+                args.append(expr)
+            else:
+                kwargs.append('%r : %s' % (key, expr))
+        return '_Apply(%s, _ParameterList([%s], {%s}))' % (
+            op, ', '.join(args), ', '.join(kwargs))
@@ -1,11 +1,15 @@
-from os import makedirs
+from os import (
+    makedirs, stat, replace, getpid, getppid, access, environ, W_OK)
 from os.path import join, dirname, expanduser, exists, normpath
+from base64 import b64encode, b64decode
 import logging
 from glob import iglob
 from itertools import chain
 from keyword import iskeyword
-
-from .utils import execfile
+from hashlib import sha1
+import marshal
+import pickle
+import sys
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
@@ -14,6 +18,11 @@ log.setLevel('DEBUG')
 DEFAULT_CONFIG_FOLDER = join(dirname(__file__), '..', 'configuration/*')
 USER_CONFIG_FOLDER = expanduser('~/.config/treefarm.conf.py')
 USER_CONFIG_FILE = expanduser('~/.config/treefarm/*')
+CODE_CACHE_FOLDER = expanduser('~/.cache/baumschule/config')
+
+# pickled configuration of the parent process, read by worker processes
+# instead of executing the configuration files again
+CONFIG_SNAPSHOT_VARIABLE = 'BAUMSCHULE_CONFIG'
 
 
 # ---------- classes ---------- #
@@ -27,7 +36,10 @@ class Environment(dict):
         self._name = name
 
     def __getattr__(self, arg):
-        return self[arg]
+        try:
+            return self[arg]
+        except KeyError:
+            raise AttributeError(arg) from None
 
     def __setattr__(self, key, value):
         self._check_key(key)
@@ -46,7 +58,7 @@ class Environment(dict):
 
     def add_ops(self, *ops):
         for op in ops:
-            assert 'name' in vars(op)
+            assert hasattr(op, 'name')
             self[op.name] = op
 
     def load_path(self, *paths):
@@ -56,7 +68,7 @@ class Environment(dict):
                 self.VARNAME : self,
                 '__file__' : filename,
             }
-            execfile(filename,  glob)
+            exec(compile_file(filename), glob)
 
 
 class Configuration(Environment):
@@ -79,6 +91,85 @@ class Configuration(Environment):
 
 
 
+# ---------- compiled files ---------- #
+
+_code_cache = {} # filename -> (stamp, code)
+
+
+def compile_file(filename, cache_folder=CODE_CACHE_FOLDER):
+    """
+    Returns the code object of a Python file.
+
+    Code objects are kept in memory and marshalled to cache_folder, keyed
+    on modification time and size of the file. If these changed, but the
+    hash of the source did not, the cached code is still used.
+    """
+    st = stat(filename)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _code_cache.get(filename)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    cache_file = None
+    if cache_folder and _writable(cache_folder):
+        cache_file = join(cache_folder, '%s.%s.bin' % (
+            sha1(filename.encode()).hexdigest(), sys.implementation.cache_tag))
+
+    entry = _read_code_cache(cache_file)
+    if entry and entry[0] == stamp:
+        code = entry[2]
+    else:
+        with open(filename, 'rb') as f:
+            source = f.read()
+        digest = sha1(source).digest()
+        if entry and entry[1] == digest:
+            code = entry[2]
+        else:
+            code = compile(source, filename, 'exec', dont_inherit=True)
+        _write_code_cache(cache_file, (stamp, digest, code))
+
+    _code_cache[filename] = (stamp, code)
+    return code
+
+
+_writable_folders = {}
+
+def _writable(folder):
+    """Whether folder exists or is created and can be written."""
+    if folder not in _writable_folders:
+        try:
+            makedirs(folder, exist_ok=True)
+            _writable_folders[folder] = access(folder, W_OK)
+        except OSError as e:
+            log.debug('no code cache in %s: %s' % (folder, e))
+            _writable_folders[folder] = False
+    return _writable_folders[folder]
+
+
+def _read_code_cache(cache_file):
+    if cache_file is None or not exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        log.debug('invalid code cache %s: %s' % (cache_file, e))
+        return None
+
+
+def _write_code_cache(cache_file, entry):
+    if cache_file is None:
+        return
+    try:
+        # write and rename, concurrent processes never read partial files
+        tmp_file = '%s.%s' % (cache_file, getpid())
+        with open(tmp_file, 'wb') as f:
+            marshal.dump(entry, f)
+        replace(tmp_file, cache_file)
+    except OSError as e:
+        log.debug('could not write code cache %s: %s' % (cache_file, e))
+
+
 # ---------- initializers ---------- #
 
 def init_config_file(path=USER_CONFIG_FILE, overwrite=False):
@@ -97,13 +188,22 @@ def init_config_file(path=USER_CONFIG_FILE, overwrite=False):
             lines[i] = '# ' + line
 
     log.info('Create new Configuration file in:', path)
-    os.makedirs(dirname(path), exist_ok=True)
+    makedirs(dirname(path), exist_ok=True)
     with open(path, 'w') as cfg_file:
         cfg_file.writelines(lines)
 
 
 def init_config():
     global config
+    # only shared by the parent process, see share_config
+    pid, _, snapshot = environ.get(CONFIG_SNAPSHOT_VARIABLE, '').partition(':')
+    if snapshot and pid == str(getppid()):
+        try:
+            config = pickle.loads(b64decode(snapshot))
+            return
+        except Exception as e:
+            log.debug('configuration snapshot not loaded: %s' % e)
+
     config = Configuration()
     config.load_path(DEFAULT_CONFIG_FOLDER)
     if exists(USER_CONFIG_FILE):
@@ -122,6 +222,69 @@ def init_env():
         env.load_path(*paths)
 
 
+# ---------- worker processes ---------- #
+
+def config_snapshot():
+    """
+    Returns the pickled configuration, e.g. for worker processes, or None
+    if it contains values that can't be pickled.
+    """
+    try:
+        return pickle.dumps(config)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        log.debug('configuration is not picklable: %s' % e)
+        return None
+
+
+_sharing = 0 # number of share_config calls not ended by unshare_config
+
+
+def share_config():
+    """
+    Returns config_snapshot and passes it to the child processes started
+    until unshare_config is called, e.g. pool workers. They load it
+    instead of executing the configuration files. Only if the
+    configuration can't be pickled, they execute the files.
+    """
+    global _sharing
+    _sharing += 1
+    snapshot = config_snapshot()
+    if snapshot is None:
+        environ.pop(CONFIG_SNAPSHOT_VARIABLE, None)
+    else:
+        environ[CONFIG_SNAPSHOT_VARIABLE] = '%s:%s' % (
+            getpid(), b64encode(snapshot).decode())
+    return snapshot
+
+
+def unshare_config():
+    """Ends a share_config, child processes execute the files again."""
+    global _sharing
+    _sharing = max(_sharing - 1, 0)
+    if not _sharing:
+        environ.pop(CONFIG_SNAPSHOT_VARIABLE, None)
+
+
+def restore_config(snapshot):
+    """
+    Updates the configuration from config_snapshot, used as initializer
+    of worker processes (forked workers don't import again). Subgroups
+    are updated in place, so references to them (e.g.
+    get_config().graphviz) see the new values.
+    """
+    if snapshot is not None:
+        _update_config(config, pickle.loads(snapshot))
+
+
+def _update_config(target, source):
+    for key, value in source.items():
+        if isinstance(value, Configuration) and \
+                isinstance(target.get(key), Configuration):
+            _update_config(target[key], value)
+        else:
+            target[key] = value
+
+
 # ---------- getters ---------- #
 
 def get_config():
@@ -0,0 +1,324 @@
+"""
+Structural hashing and equality of spaces.
+
+Parameter nodes compare by identity. The structural hash of a node is a
+Merkle digest of its type, operation and children, so structurally equal
+trees have the same digest. Digests are cached on the nodes and computed
+again after a mutation with <<= (see space_utils.get_cached).
+
+With interning enabled (see enable_interning), sample, expand and
+simplify return trees whose structurally equal nodes are one shared
+object. Interned nodes must not be mutated.
+"""
+from hashlib import blake2b
+from math import isnan
+from contextlib import contextmanager
+from weakref import WeakValueDictionary, WeakKeyDictionary
+from itertools import chain, count
+from types import MappingProxyType
+import copy
+import sys
+import os
+
+import numpy as np
+
+from .domains import (
+    Interval, ParameterList, FrozenParameterList, EMPTY_KWARGS)
+from .spaces import Apply, Parameter, Operation
+from .space_utils import get_cached, peek_cached
+from .traversal import fold
+
+DIGEST_SIZE = 16
+
+
+def structural_hash(obj):
+    """Returns the digest (bytes) of the structure of obj."""
+    return fold(obj, _visit, _digest_children, cycle=_cycle)[0]
+
+
+def structural_eq(a, b):
+    """Whether a and b have the same structure."""
+    return a is b or structural_hash(a) == structural_hash(b)
+
+
+def canonical_order(values):
+    """
+    Returns values sorted independently of the process. Iterating over a
+    set of strings gives a different order under every PYTHONHASHSEED.
+    Numbers and strings are sorted, other values by structural hash.
+    """
+    values = list(values)
+    if (all(isinstance(v, (int, float)) for v in values)
+            or all(type(v) is str for v in values)):
+        return sorted(values)
+    return sorted(values, key=structural_hash)
+
+
+class StructuralKey:
+    """
+    Wraps an object for dicts and sets that compare by structure.
+    """
+    __slots__ = ('obj', 'digest')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.digest = structural_hash(obj)
+
+    def __eq__(self, other):
+        return type(other) is StructuralKey and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return 'StructuralKey(%s)' % self.digest.hex()
+
+
+def _hash(*parts):
+    h = blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        h.update(part)
+    return h.digest()
+
+
+# The digest of a node is computed from the digests of its children with
+# traversal.fold. Results are pairs (digest, whether a cycle was reached).
+# Nodes of a cycle are hashed by a marker when reached again, their
+# digests depend on the entry point and are not cached.
+
+def _digest_children(obj):
+    if isinstance(obj, Parameter):
+        if peek_cached(obj, 'digest') is not None:
+            return ()
+        if type(obj) is Apply:
+            return (obj.operation, obj.domain)
+        return (obj.domain,)
+    if isinstance(obj, ParameterList):
+        return tuple(obj.values())
+    if isinstance(obj, dict):
+        return tuple(obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return tuple(obj)
+    return ()
+
+
+def _visit(obj, results):
+    digests = [d for d, _ in results]
+    cyclic = any(c for _, c in results)
+
+    if isinstance(obj, Parameter):
+        digest = peek_cached(obj, 'digest')
+        if digest is not None:
+            return digest, False
+        if type(obj) is Apply:
+            digest = _hash(b'A', *digests)
+        else:
+            digest = _hash(b'P', type(obj).__name__.encode(), *digests)
+        if not cyclic:
+            get_cached(obj, 'digest', lambda _ : digest)
+        return digest, cyclic
+
+    if isinstance(obj, ParameterList):
+        parts = [b'L']
+        for key, digest in zip(obj.keys(), digests):
+            parts += [_leaf(key), digest]
+        return _hash(*parts), cyclic
+
+    if isinstance(obj, Operation):
+        return _hash(
+            b'O', type(obj).__name__.encode(), obj.name.encode(),
+            _function_digest(obj.func)), False
+
+    if isinstance(obj, (list, tuple, set, frozenset, dict)):
+        if isinstance(obj, (set, frozenset, dict)):
+            digests.sort() # order independent
+        return _hash(type(obj).__name__.encode(), *digests), cyclic
+
+    return _leaf(obj), False
+
+
+def _cycle(obj):
+    return b'cycle', True
+
+
+def _leaf(value):
+    """Digest of a value, distinguishes types (1, 1.0 and '1')."""
+    if type(value) is Interval:
+        numbers = tuple(map(_canonical_number, (
+            value.start, value.stop, value.step)))
+        return _hash(b'I', repr(numbers).encode(),
+            bytes([value.left_closed, value.right_closed]))
+    if isinstance(value, np.ndarray):
+        return _hash(b'N', value.dtype.str.encode(),
+            repr(value.shape).encode(), value.tobytes())
+    if isinstance(value, (str, bytes, int, float, complex, bool, type(None))):
+        return _hash(type(value).__name__.encode(), repr(value).encode())
+    if isinstance(value, np.generic):
+        return _hash(value.dtype.str.encode(), value.tobytes())
+    if callable(value) and hasattr(value, '__qualname__'):
+        return _function_digest(value)
+    # no structure known, compare by identity
+    return _hash(b'id', type(value).__name__.encode(), repr(id(value)).encode())
+
+
+# unique numbers of functions that can't be imported by name, e.g.
+# closures and lambdas; the token separates sessions (shelved caches)
+_function_numbers = WeakKeyDictionary()
+_pinned_functions = {} # id -> function, for functions without weakrefs
+_session_token = os.urandom(8)
+
+
+def _function_digest(func):
+    """
+    Digest of a function. Functions that are found again by module and
+    qualname are hashed by these, other functions (closures, lambdas)
+    by a number unique to the function object.
+    """
+    module = getattr(func, '__module__', None)
+    qualname = getattr(func, '__qualname__', None)
+    if _importable(func, module, qualname):
+        return _hash(b'F', _leaf(module), _leaf(qualname))
+
+    try:
+        number = _function_numbers.get(func)
+        if number is None:
+            number = _function_numbers[func] = next(_function_counter)
+    except TypeError:
+        # no weak references, the id is not reused while it is pinned
+        _pinned_functions[id(func)] = func
+        number = ('id', id(func))
+    return _hash(b'f', _session_token, repr(number).encode())
+
+
+_function_counter = count()
+
+
+def _importable(func, module, qualname):
+    """Whether func is the object found by its module and qualname."""
+    if not (type(module) is str and type(qualname) is str):
+        return False
+    obj = sys.modules.get(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name, None)
+    return obj is func
+
+
+def _canonical_number(x):
+    """Numbers equal in Python (1 == 1.0) have the same representation."""
+    if isinstance(x, float) and not isnan(x) and x.is_integer():
+        return int(x)
+    return x
+
+
+# ----------------------------- interning ----------------------------------- #
+
+_interned_nodes = WeakValueDictionary() # node key -> node
+_interning = False
+
+
+def enable_interning(flag=True):
+    """Switches interning of sampled, expanded and simplified trees."""
+    global _interning
+    _interning = flag
+
+
+def interning_enabled():
+    return _interning
+
+
+@contextmanager
+def interning(flag=True):
+    """Enables interning within a with-statement."""
+    global _interning
+    previous = _interning
+    _interning = flag
+    try:
+        yield
+    finally:
+        _interning = previous
+
+
+def maybe_intern(obj):
+    """Interns obj if interning is enabled."""
+    if _interning:
+        return intern(obj)
+    return obj
+
+
+def intern(obj):
+    """
+    Returns a tree structurally equal to obj made of shared nodes.
+
+    Equal subtrees of all interned trees are the same object, as long as
+    any of them is alive. Nodes with name, dist or symbol and nodes of
+    recursive structures are not shared.
+    """
+    memo = {}
+    if isinstance(obj, list):
+        return [_intern_value(x, memo) for x in obj]
+    return _intern_value(obj, memo)
+
+
+def _intern(obj, memo):
+    if getattr(obj, '_interned', False):
+        return obj
+    if id(obj) in memo:
+        return memo[id(obj)]
+    memo[id(obj)] = obj # reached again within a cycle
+
+    plain = obj.name is None and obj.dist is None and obj.symbol is None
+    if type(obj) is Apply:
+        dom = obj.domain
+        operation = _intern_value(obj.operation, memo)
+        args = [_intern_value(v, memo) for v in dom.args]
+        kwargs = {k : _intern_value(v, memo) for k, v in dom.kwargs.items()}
+        key = (Apply, _value_key(operation),
+            tuple(map(_value_key, args)),
+            tuple((k, _value_key(v)) for k, v in kwargs.items()))
+    else:
+        key = (type(obj), _value_key(obj.domain))
+
+    node = _interned_nodes.get(key) if plain else None
+    if node is None:
+        node = obj
+        if type(obj) is Apply and (operation is not obj.operation or any(
+                new is not old for new, old in zip(
+                    chain(args, kwargs.values()),
+                    chain(dom.args, dom.kwargs.values())))):
+            node = copy.copy(obj)
+            node.operation = operation
+            node.domain = FrozenParameterList._make(
+                tuple(args), MappingProxyType(kwargs) if kwargs else EMPTY_KWARGS)
+        if plain:
+            node._interned = True
+            _interned_nodes[key] = node
+
+    memo[id(obj)] = node
+    return node
+
+
+def _intern_value(value, memo):
+    if isinstance(value, Parameter):
+        return _intern(value, memo)
+    return value
+
+
+_ATOMS = {int, float, str, bool, type(None)}
+
+def _value_key(value):
+    """
+    Key of a child for the intern table. Child nodes are identified by
+    their id, they are interned already (or unique) and kept alive by
+    their parent. Floats are keyed by their hex form (0.0 is not -0.0),
+    tuples and frozensets by the keys of their items (1 is not 1.0).
+    Other values are only shared if they are the same object.
+    """
+    if type(value) is float:
+        return (float, value.hex())
+    if type(value) in _ATOMS:
+        return (type(value), value)
+    if type(value) is tuple:
+        return (tuple, tuple(map(_value_key, value)))
+    if type(value) is frozenset:
+        return (frozenset, frozenset(map(_value_key, value)))
+    return ('id', id(value))
@@ -1,11 +1,15 @@
 from itertools import chain, product
 from functools import partial
+from bisect import bisect_right
+from math import inf, prod, log, exp, isinf
 
 from .spaces import (
     Parameter, Apply, Primitive,
     join)
 
-from .domains import ParameterList
+from .domains import ParameterList, Interval
+from .space_utils import get_cached, is_recursive
+from .hashing import canonical_order
 
 def iter_instances(param, iter_primitives=True):
     """
@@ -18,7 +22,8 @@ def iter_instances(param, iter_primitives=True):
 
     elif isinstance(param, Primitive):
         if iter_primitives:
-            yield from param.domain
+            values = _primitive_values(param)
+            yield from param.domain if values is None else values
         else:
             yield param
 
@@ -29,12 +34,7 @@ def iter_instances(param, iter_primitives=True):
             yield from chain(*map(iteri, param.domain))
 
         else:
-            if not isinstance(param.operation, Parameter):
-                operations = [param.operation]
-            else:
-                operations = param.operation
-
-            op_iter = iteri(operations)
+            op_iter = iteri(param.operation)
             pml_iterator = _ii_pml(param.domain, iter_primitives)
             for op, pml in product(op_iter, pml_iterator):
                 yield Apply(op, pml)
@@ -63,3 +63,229 @@ def _ii_pml(pml, iter_primitives):
 #
 #
 #
+
+
+class IndexedInstances:
+    """
+    Random access to the instances of a finite search space.
+
+    The k-th instance is computed directly (mixed radix over the choice
+    points), in the same order as iter_instances. Slices and shards are
+    views on a range of indices, so they can be handed to other
+    processes and iteration can be resumed at any position.
+    """
+
+    def __init__(self, param, indices=None):
+        if is_recursive(param):
+            raise ValueError('recursive spaces have infinitely many instances')
+        size = _count(param)
+        if size == inf:
+            raise ValueError('space has infinitely many instances')
+        if indices is None:
+            indices = range(size)
+        self.param = param
+        self.indices = indices
+
+    @property
+    def size(self):
+        """Number of instances, also if too large for len."""
+        r = self.indices
+        return max(0, (r.stop - r.start + r.step - (1 if r.step > 0 else -1)) // r.step)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return IndexedInstances(self.param, self.indices[key])
+        return _unrank(self.param, self.indices[key])
+
+    def __iter__(self):
+        return InstanceIterator(self)
+
+    def shard(self, i, n):
+        """Returns the i-th of n contiguous parts of about equal length."""
+        assert 0 <= i < n
+        size = self.size
+        return self[size * i // n : size * (i + 1) // n]
+
+    def index_of(self, position):
+        """Returns the index in the whole space of a position in this view."""
+        return self.indices[position]
+
+
+class InstanceIterator:
+    """Iterator over IndexedInstances, can be moved with seek."""
+
+    def __init__(self, instances, position=0):
+        self.instances = instances
+        self.position = position
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= self.instances.size:
+            raise StopIteration()
+        instance = self.instances[self.position]
+        self.position += 1
+        return instance
+
+    def seek(self, position):
+        """Continues with the instance at position."""
+        self.position = position
+
+
+def cardinality(space, max_depth=None):
+    """
+    Returns the number of instances of a space.
+
+    Continuous and unbounded primitives have infinitely many values.
+    Recursive spaces are infinite, unless max_depth limits the number of
+    nested Apply nodes, then the instances up to that depth are counted.
+    """
+    if max_depth is not None:
+        return _count_bounded(space, max_depth, {}, False)
+    if is_recursive(space):
+        return inf
+    return _count(space)
+
+
+def log_cardinality(space, max_depth=None):
+    """
+    Returns the natural logarithm of the number of instances.
+
+    Computed with floats, so it stays cheap for deeply nested recursive
+    spaces with astronomically many instances.
+    """
+    if max_depth is not None:
+        return _count_bounded(space, max_depth, {}, True)
+    size = cardinality(space)
+    return -inf if size == 0 else log(size)
+
+
+def _count(param):
+    """Number of instances of a (non recursive) parameter."""
+    if isinstance(param, Parameter):
+        return get_cached(param, 'instance_count', _count_node)
+    return 1
+
+
+def _count_node(param):
+    if isinstance(param, Primitive):
+        return _primitive_size(param)
+    if param.operation == join:
+        return sum(map(_count, param.domain))
+    return _product(map(_count, _factors(param)))
+
+
+def _count_bounded(param, depth, memo, logscale):
+    """Counts instances with at most depth nested Apply nodes."""
+    if not isinstance(param, Parameter):
+        return 0.0 if logscale else 1
+    if isinstance(param, Primitive):
+        size = _primitive_size(param)
+        return (log(size) if size else -inf) if logscale else size
+    if depth == 0:
+        return -inf if logscale else 0
+
+    key = id(param), depth
+    if key in memo:
+        return memo[key]
+    memo[key] = -inf if logscale else 0 # reached again within a cycle
+
+    if param.operation == join:
+        counts = [_count_bounded(c, depth-1, memo, logscale)
+            for c in param.domain]
+        if not logscale:
+            result = sum(counts)
+        elif not counts:
+            result = -inf
+        else:
+            # log-sum-exp
+            top = max(counts)
+            result = top if isinf(top) else top + log(
+                sum(exp(c - top) for c in counts))
+    else:
+        counts = [_count_bounded(f, depth-1, memo, logscale)
+            for f in _factors(param)]
+        if logscale:
+            result = -inf if -inf in counts else sum(counts)
+        else:
+            result = _product(counts)
+
+    memo[key] = result
+    return result
+
+
+def _factors(param):
+    return [param.operation, *param.domain.values()]
+
+
+def _product(counts):
+    counts = list(counts)
+    if 0 in counts:
+        return 0 # also if others are infinite
+    return prod(counts)
+
+
+def _primitive_size(param):
+    values = _primitive_values(param)
+    return inf if values is None else len(values)
+
+
+def _primitive_values(param):
+    """The values of a primitive in iteration order, None if unbounded."""
+    def values(param):
+        dom = param.domain
+        if isinstance(dom, Interval):
+            if not (dom.bounded and dom.step):
+                return None
+            if dom.grid.integral:
+                return _interval_range(dom)
+        if isinstance(dom, (set, frozenset)):
+            return canonical_order(dom)
+        return list(dom)
+    return get_cached(param, 'primitive_values', values)
+
+
+def _unrank(param, k):
+    """Returns the k-th instance of iter_instances(param)."""
+    if not isinstance(param, Parameter):
+        return param
+
+    if isinstance(param, Primitive):
+        return _primitive_values(param)[k]
+
+    if param.operation == join:
+        children = list(param.domain)
+        offsets = get_cached(param, 'join_offsets', _join_offsets)
+        i = bisect_right(offsets, k) - 1
+        return _unrank(children[i], k - offsets[i])
+
+    # the last argument changes fastest like in itertools.product
+    dom = param.domain
+    factors = _factors(param)
+    digits = []
+    for factor in reversed(factors):
+        k, digit = divmod(k, _count(factor))
+        digits.append(digit)
+    digits.reverse()
+
+    op = _unrank(param.operation, digits[0])
+    values = [_unrank(f, d) for f, d in zip(factors[1:], digits[1:])]
+    return Apply(op, ParameterList.from_items(zip(dom.keys(), values)))
+
+
+def _interval_range(dom):
+    """The values of a discrete interval of integers as range."""
+    grid = dom.grid
+    return range(
+        grid.value(grid.first), grid.value(grid.last) + 1, grid.step)
+
+
+def _join_offsets(param):
+    offsets = [0]
+    for child in param.domain:
+        offsets.append(offsets[-1] + _count(child))
+    return offsets
@@ -11,16 +11,19 @@ import threading
 from math import inf
 import time
 import logging
-from itertools import chain, count
+from datetime import datetime
+from collections import deque
 
 import numpy as np
 
-from .spaces import op, Categorical
+from .spaces import op, Parameter
 from .serialize import serialize
-from .protocol import SimpleProtocol, StandardProtocol
+from .protocol import SimpleProtocol, ColumnarProtocol, Journal, read_journal
 from .computing_engine import SimpleEngine
 from .environment import get_config
-from .space_utils import get_crown, get_subspace, expand
+from .iterators import cardinality
+from .encoding import Encoding
+from .utils import import_object
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
@@ -48,15 +51,58 @@ def minimize(
     search_space,
     max_iter = inf,
     timeout = inf,
-    minimizer = 'default'
+    minimizer = 'default',
+    engine = None,
+    batch_size = 1,
+    in_flight = 1,
+    journal = None,
+    resume = False,
     ):
-
+    """
+    Creates a Minimization of a search space.
+
+    engine : core.computing_engine.ComputingEngine
+        used if the minimizer is given by name or class,
+        e.g. ProcessPoolEngine to evaluate batches in parallel
+    batch_size : int
+        number of instances chosen and evaluated together
+    in_flight : int
+        if larger than one, run() keeps that many evaluations running
+        asynchronously (see Minimization.arun)
+    journal : str or True
+        file the records are appended to (see protocol.Journal), relative
+        to c.protocol_path, True names it after the current time
+    resume : bool
+        replay the records of the journal first, the minimizer is told
+        them without evaluating again and they count as iterations
+
+    minimizer 'auto' chooses one by the size of the search space
+    (see choose_minimizer).
+    """
+    assert journal or not resume, 'resume needs a journal'
+
+    if minimizer == 'auto':
+        minimizer = choose_minimizer(search_space, max_iter)
     if type(minimizer) is str:
         minimizer = conf.minimizers[minimizer]
+    if type(minimizer) is str:
+        minimizer = import_object(minimizer)
     if type(minimizer) is type:
-        minimizer = minimizer(search_space)
+        if engine is None:
+            minimizer = minimizer(search_space)
+        else:
+            minimizer = minimizer(search_space, engine=engine)
 
-    opt_obj = Minimization(minimizer, max_iter, timeout)
+    opt_obj = Minimization(minimizer, max_iter, timeout, batch_size, in_flight)
+
+    if journal:
+        if journal is True:
+            journal = datetime.now().strftime('%Y-%m-%d_%H-%M-%S.journal')
+        path = os.path.join(
+            os.path.expanduser(conf.protocol_path), os.path.expanduser(journal))
+        if resume and os.path.exists(path):
+            opt_obj.replay(read_journal(path))
+        opt_obj.observers['journal'] = Journal(path)
 
     """if return_object is None:
         # check for iteractive cell
@@ -65,45 +111,78 @@ def minimize(
     return opt_obj
 
 
+def choose_minimizer(search_space, max_iter=inf):
+    """
+    Returns the name of a minimizer suited to the size of a search space.
+
+    Spaces with at most max_iter instances are searched exhaustively,
+    all others with the default minimizer.
+    """
+    size = cardinality(search_space)
+    name = 'exhaustive' if size < inf and size <= max_iter else 'default'
+    log.info('search space has %s instances, use %s minimizer' % (size, name))
+    return name
+
+
 class Minimization(threading.Thread):
-    def __init__(self, minimizer, max_iter, timeout):
+    def __init__(
+        self, minimizer, max_iter, timeout, batch_size=1, in_flight=1):
         super().__init__()
         self.minimizer = minimizer
         self.max_iter = max_iter
         self.timeout = timeout
-        self._stop = threading.Event()
+        self.batch_size = batch_size
+        self.in_flight = in_flight
+        self._stop_event = threading.Event()
+        self._computed = deque() # records of the current batch
         self.iteration = 0
         self.start_time = None
-        self.observers = {'standard' : StandardProtocol()}
+        self.observers = {'standard' : ColumnarProtocol()}
 
     def stop(self):
-        self._stop.set()
+        self._stop_event.set()
 
     def stopped(self):
-        return self._stop.isSet()
+        return self._stop_event.is_set()
 
     def __iter__(self):
         self.start_time = time.time()
         reason = 'external'
 
-        while True:
-            if self.iteration >= self.max_iter:
-                reason = 'max_iteration'
-                self.stop()
-            elif self.timeout <= time.time() - self.start_time:
-                reason = 'timeout'
-                self.stop()
+        try:
+            while True:
+                if self.iteration >= self.max_iter:
+                    reason = 'max_iteration'
+                    self.stop()
+                elif self.timeout <= time.time() - self.start_time:
+                    reason = 'timeout'
+                    self.stop()
 
-            if self.stopped():
-                break
+                if self.stopped():
+                    break
 
-            yield next(self)
+                try:
+                    record = next(self)
+                except StopIteration:
+                    reason = 'exhausted'
+                    break
+
+                yield record
+        finally:
+            self.close()
 
         log.debug('minimization finished: %s' % reason)
 
     def __next__(self):
+        if not self._computed:
+            size = int(min(self.batch_size, self.max_iter - self.iteration))
+            if size > 1:
+                self._computed.extend(self.minimizer.compute_batch(size))
+            else:
+                self._computed.append(self.minimizer.compute_next())
+
         self.iteration += 1
-        record = self.minimizer.compute_next()
+        record = self._computed.popleft()
         self.write(**record)
         return record
 
@@ -111,10 +190,96 @@ class Minimization(threading.Thread):
         for ob in self.observers.values():
             ob.write(*args, **kwargs)
 
+    def replay(self, records):
+        """Tells the minimizer recorded results without evaluating them."""
+        for record in records:
+            result = self.minimizer.tell(**record)
+            self.iteration += 1
+            self.write(**result)
+        log.debug('replayed %s records' % len(records))
+
+    def close(self):
+        """Flushes and closes observers that write to files."""
+        for ob in self.observers.values():
+            if hasattr(ob, 'close'):
+                ob.close()
+
     def run(self):
+        if self.in_flight > 1:
+            import asyncio
+            asyncio.run(self.arun())
+            return
+
         for result in iter(self):
-            log.info(' Iteration %s, %s, perf %s'\
-                % (self.iteration, result['instance_str'], result['perf']))
+            self.log_result(result)
+
+    async def arun(self):
+        """
+        Keeps in_flight evaluations running at the same time.
+
+        Whenever an evaluation finishes, its result is told to the
+        minimizer and new instances are proposed, so proposing and
+        evaluating overlap. Evaluations run concurrently only if the
+        engine of the minimizer has a pool (see engine.submit).
+        """
+        import asyncio # slow to import, only needed here
+        self.start_time = time.time()
+        engine = self.minimizer.engine
+        running = {} # future -> (instance, submit time, select time)
+        submitted = 0
+        exhausted = False
+        reason = 'external'
+
+        try:
+            while True:
+                if submitted >= self.max_iter:
+                    reason = 'max_iteration'
+                    self.stop()
+                elif self.timeout <= time.time() - self.start_time:
+                    reason = 'timeout'
+                    self.stop()
+
+                size = int(min(
+                    self.in_flight - len(running), self.max_iter - submitted))
+                if size > 0 and not (self.stopped() or exhausted):
+                    start_ts = time.time()
+                    instances = self.minimizer.propose(size)
+                    if len(instances) < size:
+                        exhausted = True
+                        reason = 'exhausted'
+                    if instances:
+                        select_time = (time.time() - start_ts) / len(instances)
+                    submitted += len(instances)
+
+                    for instance in instances:
+                        future = asyncio.wrap_future(engine.submit(instance))
+                        running[future] = (instance, time.time(), select_time)
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED)
+
+                for future in done:
+                    instance, submit_ts, select_time = running.pop(future)
+                    result = self.minimizer.tell(
+                        instance,
+                        perf = future.result(),
+                        start_ts = submit_ts - select_time,
+                        select_time = select_time,
+                        comp_time = time.time() - submit_ts)
+                    self.iteration += 1
+                    self.write(**result)
+                    self.log_result(result)
+        finally:
+            self.close()
+
+        log.debug('minimization finished: %s' % reason)
+
+    def log_result(self, result):
+        log.info(' Iteration %s, %s, perf %s'\
+            % (self.iteration, result['instance_str'], result['perf']))
 
 
 class Minimizer:
@@ -124,6 +289,7 @@ class Minimizer:
         self.search_space = search_space
         self.engine = engine
         self.observers = {'protocol' : SimpleProtocol()}
+        self.pending = [] # proposed instances without result
         self.best_instance = None
         self.best_perf = inf
 
@@ -131,6 +297,16 @@ class Minimizer:
     def protocol(self):
         return self.observers['protocol']
 
+    @property
+    def plan(self):
+        """The search space compiled by the engine (see engine.compile)."""
+        space = self.search_space
+        compiled = getattr(self, '_plan', None)
+        if compiled is None or compiled[:2] != (id(space), Parameter.mutations):
+            compiled = id(space), Parameter.mutations, self.engine.compile(space)
+            self._plan = compiled
+        return compiled[2]
+
 
 class SequentialMinimizer(Minimizer):
 
@@ -138,13 +314,67 @@ class SequentialMinimizer(Minimizer):
         """Chooses an instance, computes the result and protocols"""
         # maybe use timestructs or datetime here
         start_ts = time.time()
-        instance = self.pick_next()
+        instances = self.propose(1)
+        if not instances:
+            raise StopIteration()
+        instance, = instances
         select_time = time.time() - start_ts
         instance_str = serialize(instance)
         log.debug('Compute: %s' % instance_str)
-        perf = self.engine.evaluate(instance)
+        perf = self.plan(instance)
         comp_time = time.time() - start_ts - select_time
 
+        return self.tell(
+            instance, perf, start_ts, select_time, comp_time, instance_str)
+
+    def compute_batch(self, size):
+        """
+        Chooses up to size instances, computes them with one call to
+        engine.evaluate_batch and protocols them.
+
+        Selection and computation time are shared equally by the records.
+        """
+        start_ts = time.time()
+        instances = self.propose(size)
+        if not instances:
+            raise StopIteration()
+        select_time = time.time() - start_ts
+        perfs = self.engine.evaluate_batch(instances)
+        comp_time = time.time() - start_ts - select_time
+
+        n = len(instances)
+        return [
+            self.tell(instance, perf, start_ts, select_time/n, comp_time/n)
+            for instance, perf in zip(instances, perfs)]
+
+    def propose(self, size=1):
+        """
+        Chooses up to size instances and adds them to the pending ones.
+
+        The results must be reported with tell.
+        """
+        instances = self.pick_batch(size)
+        self.pending.extend(instances)
+        return instances
+
+    def tell(
+        self, instance, perf, start_ts=None, select_time=0., comp_time=0.,
+        instance_str=None):
+        """
+        Protocols the performance of a proposed instance.
+
+        Returns the record written to the observers.
+        """
+        for i, pending in enumerate(self.pending):
+            if pending is instance:
+                del self.pending[i]
+                break
+
+        if start_ts is None:
+            start_ts = time.time()
+        if instance_str is None:
+            instance_str = serialize(instance)
+
         result = {
             'instance' : instance,
             'instance_str' : instance_str,
@@ -166,22 +396,34 @@ class SequentialMinimizer(Minimizer):
     def pick_next(self):
         raise NotImplementedError()
 
+    def pick_batch(self, size):
+        """Chooses up to size instances, fewer if the space is exhausted."""
+        instances = []
+        for _ in range(size):
+            try:
+                instances.append(self.pick_next())
+            except StopIteration:
+                break
+        return instances
+
 
 class FlatMinimizer(Minimizer):
-    # TODO make one-hot coding minional
+    """
+    Minimizer that works on the numeric encoding of instances (see
+    encoding.Encoding), e.g. as inputs of a Gaussian process.
 
-    def __init__(self, search_space, categ_to_onehot=False, **kwargs):
-        super().__init__(search_space=search_space, **kwargs)
+    scale_inputs : bool
+        scale bounded discrete and continuous values to [0, 1]
+    """
 
-        # get crown & calc dimensions of the Gaussian process
-        crown, crown_indices = get_crown(search_space, include_primitives=True)
-        dim_number = sum(
-            len(ss.domain) if type(ss) is Categorical else 1
-            for ss in crown)
+    def __init__(self, search_space, categ_to_onehot=False,
+            scale_inputs=False, **kwargs):
+        super().__init__(search_space=search_space, **kwargs)
 
-        self.dim_number = dim_number
-        self.crown = crown
-        self.crown_indices = crown_indices
+        self.encoding = Encoding(search_space, scale=scale_inputs)
+        self.dim_number = self.encoding.width
+        self.crown = self.encoding.crown
+        self.crown_indices = self.encoding.crown_indices
 
         transform, back_transform = self.construct_transforms()
         self.transform = transform
@@ -191,35 +433,36 @@ class FlatMinimizer(Minimizer):
         """
         Returns a function that maps instances from the search space into
         a numerical vector space (i.e. applies one hot coding to categories)
+        and one that maps (relaxed) vectors to the nearest valid instance.
 
         Example:
             If the third entry in a search space is {'A','B','C'},
-            the translations become: {'A':(0,0,1), 'B':(0,1,0), 'C':(1,0,0)}
-            transform([1,3,'A',9]) -> [1,3,0,0,1,9]
+            the translations become: {'A':(1,0,0), 'B':(0,1,0), 'C':(0,0,1)}
+            transform([1,3,'A',9]) -> [1,3,1,0,0,9]
         """
-
-
-        translations = {} # stores the on-hot code for a label
-        for i, ss in enumerate(self.crown):
-            if type(ss) != Categorical:
-                continue
-            one_hot = lambda j : tuple(int(j==x) for x in range(len(ss.domain)))
-            code = map(one_hot, count())
-            items = zip(ss.domain, code)
-            translations[i] = dict(items)
+        encoding = self.encoding
 
         def transform(tree):
-            vector = [get_subspace(tree, i) for i in self.crown_indices]
-            it = chain.from_iterable(
-                translations[i][val] if i in translations else [val]
-                for i,val in enumerate(vector))
-            return np.array(tuple(it))
+            return encoding.encode([tree])[0]
 
         def back_transform(vector):
-            return expand(self.search_space, vector)
+            """Maps a (relaxed) vector to the nearest valid instance."""
+            return encoding.decode(vector)[0]
 
         return transform, back_transform
 
+    def transform_batch(self, instances):
+        """Transforms a list of instances into a matrix."""
+        return self.encoding.encode(instances)
+
+    def back_transform_batch(self, X):
+        """Maps the rows of a matrix to the nearest valid instances."""
+        return self.encoding.decode(X)
+
+    def transform_bounds(self):
+        """Returns (lower, upper) for each dimension, None if unbounded."""
+        return self.encoding.bounds()
+
 
 
 
@@ -1,9 +1,19 @@
 from collections import namedtuple
 import os
+import io
 import json
+import time
+import pickle
+import logging
 from datetime import datetime
 from itertools import chain
 
+import numpy as np
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+log.setLevel('INFO')
+
 from .utils import get_minium_perfs
 
 
@@ -23,26 +33,33 @@ class SimpleProtocol(Protocol, list):
         self.append((instance, perf))
 
     def get_min(self):
-        return get_best(self, min)
+        return self.get_best(min)
 
     def get_max(self):
-        return get_best(self, max)
+        return self.get_best(max)
 
     def get_best(self, opt_func):
         """
         Returns all entrys having the best performance.
 
         """
-        filt = lambda rec : rec.perf
-        perfs = map(filt, self)
-        best_perf = opt_func(perf)
-        filt = lambda rec : rec.perf == best_perf
+        best_perf = opt_func(perf for _, perf in self)
+        filt = lambda rec : rec[1] == best_perf
         return tuple(filter(filt, self))
 
 
 class PerfDictProtocol(Protocol, dict):
+    """Maps the structural hashes of instances to (instance, perf)."""
+
     def write(self, instance_str, instance, perf, **kwargs):
-        self[instance_str] = (instance, perf)
+        from .hashing import structural_hash
+        self[structural_hash(instance)] = (instance, perf)
+
+    def get_perf(self, instance, default=None):
+        """Returns the performance of a structurally equal instance."""
+        from .hashing import structural_hash
+        entry = self.get(structural_hash(instance))
+        return default if entry is None else entry[1]
 
 
 varnames = 'name start_ts select_time comp_time perf'.split()
@@ -74,3 +91,250 @@ class StandardProtocol(Protocol, list):
 
     def minium_perfs(self):
         return get_minium_perfs(self)
+
+
+class ColumnarProtocol(Protocol):
+    """
+    Stores the records of StandardProtocol column by column.
+
+    The numeric columns are numpy arrays that grow by doubling, instance
+    strings are interned and stored as indices into a string table. The
+    best and worst record and the running minimum of the performance are
+    updated on write, so get_min, get_max and minium_perfs take constant
+    time. Indexing and iteration return Records like StandardProtocol.
+    """
+
+    columns = varnames[1:]
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._data = {
+            col : np.empty(capacity, dtype=float) for col in self.columns}
+        self._running_min = np.empty(capacity, dtype=float)
+        self._codes = np.empty(capacity, dtype=np.int64)
+        self._strings = [] # code -> instance string
+        self._string_codes = {} # instance string -> code
+        self._argmin = self._argmax = None
+        self._min_perf = self._max_perf = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._codes)
+
+    def _grow(self):
+        capacity = max(2 * self.capacity, 16)
+        for col, arr in self._data.items():
+            self._data[col] = np.resize(arr, capacity)
+        self._running_min = np.resize(self._running_min, capacity)
+        self._codes = np.resize(self._codes, capacity)
+
+    def intern(self, instance_str):
+        """Returns the code of an instance string."""
+        code = self._string_codes.get(instance_str)
+        if code is None:
+            code = len(self._strings)
+            self._string_codes[instance_str] = code
+            self._strings.append(instance_str)
+        return code
+
+    def write(self, instance_str, start_ts, select_time, comp_time, perf, **kwargs):
+        i = self._size
+        if i == self.capacity:
+            self._grow()
+
+        data = self._data
+        data['start_ts'][i] = start_ts
+        data['select_time'][i] = select_time
+        data['comp_time'][i] = comp_time
+        data['perf'][i] = perf
+        self._codes[i] = self.intern(instance_str)
+
+        if i == 0 or perf < self._min_perf:
+            self._argmin, self._min_perf = i, perf
+        if i == 0 or perf > self._max_perf:
+            self._argmax, self._max_perf = i, perf
+        self._running_min[i] = self._min_perf
+        self._size = i + 1
+
+    def column(self, name):
+        """Returns a read-only view of a column."""
+        if name == 'name':
+            return [self._strings[c] for c in self._codes[:self._size]]
+        view = self._data[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def record(self, i):
+        data = self._data
+        return Record(
+            self._strings[self._codes[i]],
+            *(data[col][i].item() for col in self.columns))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('protocol index out of range')
+        return self.record(index)
+
+    def __iter__(self):
+        return (self.record(i) for i in range(self._size))
+
+    def to_dataframe(self):
+        """
+        Returns the protocol as DataFrame, the numeric columns share memory
+        with the protocol and the names are categorical.
+        """
+        import pandas as pd
+        n = self._size
+        names = pd.Categorical.from_codes(
+            self._codes[:n], categories=pd.Index(self._strings, dtype=object))
+        columns = {'name' : names}
+        columns.update((col, self._data[col][:n]) for col in self.columns)
+        return pd.DataFrame(columns, copy=False)
+
+    def to_csv(self, filename):
+        df = self.to_dataframe()
+        df.to_csv(filename)
+
+    def get_min(self):
+        if not self._size:
+            raise ValueError('empty protocol')
+        return self.record(self._argmin)
+
+    def get_max(self):
+        if not self._size:
+            raise ValueError('empty protocol')
+        return self.record(self._argmax)
+
+    def minium_perfs(self):
+        view = self._running_min[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def __getstate__(self):
+        # drop the unused capacity
+        state = self.__dict__.copy()
+        n = self._size
+        state['_data'] = {col : arr[:n].copy() for col, arr in self._data.items()}
+        state['_running_min'] = self._running_min[:n].copy()
+        state['_codes'] = self._codes[:n].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not self.capacity:
+            self._grow()
+
+
+class Journal(Protocol):
+    """
+    Appends the records to a file, so they survive a crash.
+
+    Each record is one pickle frame. Frames are buffered and written
+    every flush_every records, or with the next record once
+    fsync_interval seconds have passed since the last write. The file is
+    synced to disk at most every fsync_interval seconds and on close. It
+    is opened on the first flush.
+
+    path : str
+        journal file, directories are created
+    """
+
+    def __init__(self, path, flush_every=10, fsync_interval=10.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._buffer = io.BytesIO()
+        self._buffered = 0
+        self._synced_at = self._flushed_at = time.time()
+
+    def write(self, instance, instance_str, start_ts, select_time, comp_time,
+        perf, **kwargs):
+        record = {
+            'instance' : instance,
+            'instance_str' : instance_str,
+            'start_ts' : start_ts,
+            'select_time' : select_time,
+            'comp_time' : comp_time,
+            'perf' : perf,
+        }
+        try:
+            frame = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            raise pickle.PicklingError(
+                'cannot journal %s, %s cannot be pickled: %s'
+                % (instance_str, _unpicklable(instance), e)) from e
+        self._buffer.write(frame)
+        self._buffered += 1
+        if (self._buffered >= self.flush_every
+                or time.time() - self._flushed_at >= self.fsync_interval):
+            self.flush()
+
+    def flush(self, sync=False):
+        """Writes the buffered records, syncs if due or sync is set."""
+        if self._file is None or self._file.closed:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        if self._buffered:
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = io.BytesIO()
+            self._buffered = 0
+        self._file.flush()
+        self._flushed_at = time.time()
+        if sync or time.time() - self._synced_at >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._synced_at = time.time()
+
+    def close(self):
+        if self._buffered or self._file is not None and not self._file.closed:
+            self.flush(sync=True)
+            self._file.close()
+
+
+def _unpicklable(node):
+    """Returns the innermost part of an instance that cannot be pickled."""
+    children = ()
+    if hasattr(node, 'operation'):
+        children = (node.operation, *node.domain)
+    for child in children:
+        try:
+            pickle.dumps(child)
+        except Exception:
+            return _unpicklable(child)
+    return node
+
+
+def read_journal(path, repair=True):
+    """
+    Returns the records of a journal.
+
+    A frame that was cut off by a crash ends the journal. If repair is
+    set, it is removed from the file, so records can be appended again.
+    """
+    records = []
+    with open(path, 'rb') as f:
+        end = 0
+        while True:
+            try:
+                records.append(pickle.load(f))
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError, IndexError) as e:
+                log.warning('journal %s is truncated: %s' % (path, e))
+                break
+            end = f.tell()
+        truncated = end < os.path.getsize(path)
+
+    if truncated and repair:
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+    return records
@@ -1,6 +1,8 @@
 
 import random
 import logging
+from itertools import repeat
+from functools import partial
 
 import numpy as np
 
@@ -9,30 +11,241 @@ from .spaces import (
     Combination
 )
 
-from .domains import ParameterList, Interval
+from .domains import FrozenParameterList, EMPTY_KWARGS, Interval
 from .serialize import serialize
+from .space_utils import get_crown, get_cached
+from .utils import gc_paused
+from .hashing import maybe_intern
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
 log.setLevel('INFO')
 
 # --- sample from params -- #
-def sample(param):
-    log.debug('sample:%s' % param)
+def sample(param, n=None, columnar=False):
+    """
+    Draws instances from a search space.
+
+    Parameters
+    ----------
+        param : core.spaces.Parameter
+        n : int
+            if given, n instances are drawn at once and returned as list
+        columnar : bool
+            return the values of the choice points of the crown
+            (see space_utils.get_crown) as an array of shape (n, len(crown))
+    """
+    log.debug('sample:%s', param)
+    instances = compile_sampler(param, columnar)(n)
+    if columnar:
+        return instances
+    return maybe_intern(instances)
 
+
+def compile_sampler(param, columnar=False):
+    """
+    Returns a reusable function sampler(n=None) for a search space.
+
+    The tree is analysed once, the sampler is cached on the space and
+    rebuilt when the space has been mutated with <<=.
+    """
     if not isinstance(param, Parameter):
-        return param
+        return lambda n=None : param if n is None else [param] * n
+    if columnar:
+        return get_cached(param, 'column_sampler', _build_column_sampler)
+    return get_cached(param, 'sampler', _build_sampler)
+
+
+def _build_sampler(param):
+    plan = compile_plan(param)
+
+    def sampler(n=None):
+        if n is None:
+            return plan(1)[0]
+        with gc_paused():
+            return plan(n)
+
+    return sampler
+
+
+def _build_column_sampler(param):
+    """Draws n values for every choice point of the crown of a space."""
+    crown, _ = get_crown(param, include_primitives=True)
+    memo = {}
+    column_dists = []
+    for subspace in crown:
+        if type(subspace) in PRIMITIVE_TYPES and not subspace.dist:
+            column_dists.append(get_default_dist(subspace))
+        else:
+            plan = compile_plan(subspace, memo)
+            column_dists.append(lambda n, plan=plan : _object_array(plan(n)))
+
+    def sampler(n=None):
+        if n is None:
+            return sampler(1)[0]
+        with gc_paused():
+            columns = [dist(n) for dist in column_dists]
+        if not columns:
+            return np.empty((n, 0))
+        if all(col.dtype != object for col in columns):
+            return np.column_stack(columns)
+        out = np.empty((n, len(columns)), dtype=object)
+        for j, col in enumerate(columns):
+            out[:, j] = col
+        return out
+
+    return sampler
+
+
+def compile_plan(param, memo=None):
+    """
+    Compiles a search space into a sampling plan.
+
+    A plan is a function plan(size) that returns a list of size instances.
+    Primitives are drawn with one numpy call per plan call, choice points
+    (join) split the batch among their children. The tree is only walked
+    once, recursive spaces refer to their own plan nodes. Compiling and
+    drawing use explicit stacks, so deep spaces and deep samples of
+    recursive spaces don't hit the recursion limit.
+    """
+    if memo is None:
+        memo = {}
+    pending = []
+    root = _plan_node(param, memo, pending)
+    while pending:
+        _fill_plan_node(pending.pop(), memo, pending)
+    return partial(_run_plan, root)
+
+
+class _PlanNode:
+    """
+    kind is _CONSTANT (value), _DRAW (value(size) returns the values),
+    _JOIN or _APPLY, whose children are plan nodes. The children of
+    _APPLY are the operation, args and kwargs of keys.
+    """
+    __slots__ = ('kind', 'value', 'children', 'nargs', 'keys')
+
+    def __init__(self, kind, value=None):
+        self.kind = kind
+        self.value = value
 
-    if vars(param).get('dist', False):
-        dist = param.dist
 
-    dist = get_default_dist(param)
-    return dist()
+_CONSTANT, _DRAW, _JOIN, _APPLY = range(4)
+
+
+def _plan_node(param, memo, pending):
+    """Returns the plan node of param, its children are filled later."""
+    if not isinstance(param, Parameter):
+        return _PlanNode(_CONSTANT, param)
+    node = memo.get(id(param))
+    if node is not None:
+        return node
+
+    if param.dist:
+        node = _PlanNode(_DRAW,
+            lambda size : [param.dist() for _ in range(size)])
+    elif type(param) is Apply:
+        node = _PlanNode(_JOIN if param.operation == join else _APPLY, param)
+        pending.append(node)
+    elif type(param) in PRIMITIVE_TYPES:
+        dist = get_default_dist(param)
+        # scalar draws avoid numpy's overhead for sized draws
+        node = _PlanNode(_DRAW,
+            lambda size : [dist()] if size == 1 else dist(size).tolist())
+    else:
+        node = _PlanNode(_CONSTANT, param)
+    memo[id(param)] = node
+    return node
+
+
+def _fill_plan_node(node, memo, pending):
+    param, node.value = node.value, None
+    dom = param.domain
+    if node.kind == _JOIN:
+        children = _unique(dom.values())
+    else:
+        node.nargs = len(dom.args)
+        node.keys = list(dom.kwargs.keys())
+        children = [
+            param.operation, *dom.args, *(dom.kwargs[k] for k in node.keys)]
+    node.children = [_plan_node(c, memo, pending) for c in children]
+
+
+def _run_plan(root, size):
+    """Draws size instances, the plan nodes are run from a stack."""
+    stack = [(root, size, None)]
+    push, pop = stack.append, stack.pop
+    results = []
+    store = results.append
+
+    while stack:
+        node, size, parts = pop()
+        kind = node.kind
+
+        if parts is None:
+            if kind == _CONSTANT:
+                store([node.value] * size)
+            elif kind == _DRAW:
+                store(node.value(size))
+            elif kind == _JOIN:
+                children = node.children
+                if not children:
+                    raise ValueError('Cannot sample from an empty join.')
+                if len(children) == 1:
+                    push((children[0], size, None))
+                elif size == 1:
+                    push((children[np.random.randint(len(children))], 1, None))
+                else:
+                    chosen = np.random.randint(len(children), size=size)
+                    buckets = [[] for _ in children]
+                    for i, k in enumerate(chosen.tolist()):
+                        buckets[k].append(i)
+                    used = [(c, b) for c, b in zip(children, buckets) if b]
+                    push((node, size, [b for _, b in used]))
+                    for child, indices in reversed(used):
+                        push((child, len(indices), None))
+            else:
+                push((node, size, ()))
+                for child in reversed(node.children):
+                    push((child, size, None))
+            continue
+
+        # all children are drawn, their results are on top
+        num = len(parts) if kind == _JOIN else len(node.children)
+        values = results[-num:]
+        del results[-num:]
+
+        if kind == _JOIN:
+            out = [None] * size
+            for indices, vals in zip(parts, values):
+                for i, val in zip(indices, vals):
+                    out[i] = val
+            store(out)
+            continue
+
+        operations, *values = values
+        nargs, keys = node.nargs, node.keys
+        args = zip(*values[:nargs]) if nargs else repeat((), size)
+        make_apply, make_plist = Apply._make, FrozenParameterList._make
+        if not keys:
+            store([
+                make_apply(op, make_plist(a, EMPTY_KWARGS))
+                for op, a in zip(operations, args)])
+        else:
+            kwargs = zip(*values[nargs:])
+            store([
+                make_apply(op, make_plist(a, dict(zip(keys, kw))))
+                for op, a, kw in zip(operations, args, kwargs)])
+
+    result, = results
+    return result
 
 
 def get_default_dist(param):
     """
-    Returns a function
+    Returns a function dist(size=None)
+
+    Without size a single value is drawn, otherwise an array of values.
     """
 
     if type(param) is Categorical:
@@ -45,7 +258,7 @@ def get_default_dist(param):
         dist = default_continous(param)
 
     elif type(param) is Apply:
-        dist = default_apply(param)
+        dist = compile_sampler(param)
 
     else:
         dist = lambda : param
@@ -54,8 +267,9 @@ def get_default_dist(param):
 
 
 def default_categorical(param):
-    def dist():
-        return random.sample(param.domain, 1)[0]
+    domain = _object_array(param.domain)
+    def dist(size=None):
+        return domain[np.random.randint(len(domain), size=size)]
     return dist
 
 
@@ -73,13 +287,22 @@ def default_discrete(param):
         l_inf = r_inf = False
 
     if l_inf and r_inf:
-        dist = lambda : round(np.random.normal())
+        dist = lambda size=None : _round(np.random.normal(size=size))
     if not l_inf and r_inf:
-        dist = lambda : round(np.random.lognormal() + start)
+        dist = lambda size=None : _round(np.random.lognormal(size=size) + start)
     if l_inf and not r_inf:
-        dist = lambda : round(-np.random.lognormal() + stop)
+        dist = lambda size=None : _round(-np.random.lognormal(size=size) + stop)
     if not l_inf and not r_inf:
-        dist = lambda : np.random.randint(start, stop)
+        if type(param.domain) == Interval:
+            # indices of the grid points, also for float steps
+            grid = param.domain.grid
+            def dist(size=None):
+                k = np.random.randint(grid.first, grid.last + 1, size)
+                if size is None:
+                    return grid.value(int(k))
+                return grid.values(k)
+        else:
+            dist = lambda size=None : np.random.randint(start, stop, size)
 
     return dist
 
@@ -92,48 +315,44 @@ def default_continous(param):
     r_inf = (dom.stop == float('inf'))
 
     if l_inf and r_inf:
-        dist = np.random.normal
+        dist = lambda size=None : np.random.normal(size=size)
     if not l_inf and r_inf:
-        dist = lambda : np.random.lognormal() + dom.start
+        dist = lambda size=None : np.random.lognormal(size=size) + dom.start
     if l_inf and not r_inf:
-        dist = lambda : -np.random.lognormal() + dom.stop
+        dist = lambda size=None : -np.random.lognormal(size=size) + dom.stop
     if not l_inf and not r_inf:
-        dist = lambda : np.random.uniform(dom.start, dom.stop)
+        dist = lambda size=None : np.random.uniform(dom.start, dom.stop, size)
 
     return dist
 
 
-def default_apply(param, through_combination=True):
+PRIMITIVE_TYPES = (Categorical, Discrete, Continuous)
 
-    if param.operation == join:
-        def dist():
-            start = random.sample(set(param.domain), 1)[0]
-            return sample(start)
 
-        """elif param.operation == quote:
-            assert len(param.domain) == 1
-            def dist():
-                return param.domain[0]"""
+def _round(value):
+    if np.ndim(value):
+        return np.rint(value).astype(int)
+    return round(value)
 
-        """elif type(param.operation) == Combination and through_combination:
-            def dist():
-                args = [sample(x) for x in param.domain.args]
-                kwargs = {k:sample(v) for k,v in param.domain.kwargs.items()}
-                new_param = power.func(*args, **kwargs)
-                return sample(new_param)"""
 
-    else:
-        def inner_dist():
-            args = [sample(start) for start in param.domain.args]
-            kwargs = {k:sample(v) for k, v in param.domain.kwargs.items()}
-            return ParameterList(args, kwargs)
+def _unique(values):
+    """Removes identical objects, keeps order."""
+    seen = set()
+    out = []
+    for val in values:
+        if id(val) not in seen:
+            seen.add(id(val))
+            out.append(val)
+    return out
 
-        def dist():
-            plist = inner_dist()
-            operation = sample(param.operation)
-            return Apply(operation, plist)
 
-    return dist
+def _object_array(values):
+    """Converts to a 1-d object array without unpacking nested sequences."""
+    values = list(values)
+    arr = np.empty(len(values), dtype=object)
+    for i, val in enumerate(values):
+        arr[i] = val
+    return arr
 
 
 # ------ Distributions ------ #
@@ -3,9 +3,14 @@ Pretty formats for parameters.
 """
 import logging
 import textwrap
+import re
+import struct
+import pickle
+from ast import literal_eval
 
-from .spaces import Apply, Parameter, Operation
-from .space_utils import is_recursive
+from .spaces import Apply, Parameter, Operation, lookup_operation
+from .domains import FrozenParameterList, EMPTY_KWARGS
+from .traversal import fold, children
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
@@ -14,79 +19,381 @@ log.setLevel('INFO')
 
 def serialize(param, lispstyle=False):
     """
-    Converts non-recursive trees into a Parseable string.
+    Converts non-recursive trees into a Parseable string (see parse).
 
-    Not recursion save.
+    Written in one pass into a buffer, cycles raise a ValueError. Strings
+    are written quoted, as Python literals (they used to be written as
+    they are, parse reads such unquoted words as strings).
     """
+    sep = ', '
+    out = []
+    write = out.append
+    # the stack holds text, nodes and ids of nodes whose end is reached
+    stack = [_node_or_str(param)]
+    pop, push = stack.pop, stack.append
+    in_progress = set()
+
+    while stack:
+        item = pop()
+        if type(item) is str:
+            write(item)
+            continue
+        if type(item) is int:
+            in_progress.discard(item)
+            continue
+
+        if id(item) in in_progress:
+            raise ValueError(
+                'serialization of recursive structures not supported yet')
+        in_progress.add(id(item))
+
+        dom = item.domain
+        num_args = len(dom.args)
+        items = [*dom.args, *dom.kwargs.items()]
+        push(id(item))
+        push(')')
+        for i in range(len(items) - 1, -1, -1):
+            if i < num_args:
+                push(_node_or_str(items[i]))
+            else:
+                key, value = items[i]
+                push(_node_or_str(value))
+                push(key + '=')
+            if i or lispstyle:
+                push(sep)
+        if lispstyle:
+            if not items:
+                push(sep)
+            push(_node_or_str(item.operation))
+            push('(')
+        else:
+            push('(')
+            push(_node_or_str(item.operation))
 
-    assert not is_recursive(param),\
-        'serialization of recursive structures not supported yet'
+    return ''.join(out)
 
-    sep = ', '
 
-    if type(param) == Apply:
+def _node_or_str(value):
+    if type(value) is Apply:
+        return value
+    return _value_str(value)
+
+
+def _value_str(value):
+    if type(value) is str or type(value) is bytes:
+        return repr(value)
+    elif str(type(value)) == "<class 'numpy.ndarray'>":
+        return 'ndarray%s'% (value.shape,)
+    return str(value)
+
+
+# ------------------------------- parsing ----------------------------------- #
+
+_TOKENS = re.compile(r"""\s*(?:
+    (?P<str>[bB]?(?:'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"))
+  | (?P<num>[-+]?(?:
+        (?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?j?
+      | (?:inf|nan)\b))
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<punct>[()\[\]{},=:])
+  | (?P<error>\S))""", re.VERBOSE)
 
-        op_name = serialize(param.operation)
+_CONSTANTS = {'True' : True, 'False' : False, 'None' : None}
+_CLOSING = {'(' : ')', '[' : ']', '{' : '}'}
 
-        arg_vals = tuple(map(serialize, param.domain.args))
-        if param.domain.kwargs:
-            kwarg_keys, kwarg_vals = zip(*param.domain.kwargs.items())
-            kwarg_vals =  map(serialize, kwarg_vals)
-            kwarg_items = [
-                '%s=%s' % item for item in zip(kwarg_keys, kwarg_vals)]
+
+def parse(string, env=None):
+    """
+    Parses the output of serialize back into an instance.
+
+    Operations are looked up by name in the builtin operations and the
+    environment (or the mapping env), values must be Python literals.
+    Other names are read as strings, as older versions of serialize
+    wrote them without quotes.
+    """
+    lookup = lookup_operation if env is None else env.__getitem__
+    tokens = [
+        (m.lastgroup, m.group(m.lastgroup), m.start(m.lastgroup), m.end())
+        for m in _TOKENS.finditer(string)]
+
+    frames = [[None, [], {}, None]] # operation, args, kwargs, key
+    i = 0
+    while i < len(tokens):
+        kind, text, start, end = tokens[i]
+        i += 1
+        nxt = tokens[i][1] if i < len(tokens) else None
+
+        if kind == 'name' and nxt == '(':
+            frames.append([_resolve(lookup, text), [], {}, None])
+            i += 1
+            continue
+        if kind == 'name' and nxt == '=' and len(frames) > 1:
+            frames[-1][3] = text
+            i += 1
+            continue
+
+        if kind == 'punct':
+            if text == ',':
+                continue
+            if text == ')' and len(frames) > 1:
+                op, args, kwargs, _ = frames.pop()
+                value = Apply._make(op, FrozenParameterList._make(
+                    tuple(args), kwargs or EMPTY_KWARGS))
+            elif text in _CLOSING:
+                # container value, parsed as a whole
+                depth = 1
+                while depth:
+                    if i == len(tokens):
+                        raise ValueError('unbalanced %r in %r' % (text, string))
+                    depth += {'(' : 1, '[' : 1, '{' : 1,
+                        ')' : -1, ']' : -1, '}' : -1}.get(tokens[i][1], 0)
+                    i += 1
+                value = literal_eval(string[start:tokens[i-1][3]])
+            else:
+                raise ValueError('unexpected %r in %r' % (text, string))
+        elif kind == 'name':
+            if text in _CONSTANTS:
+                value = _CONSTANTS[text]
+            else:
+                value = _lookup(lookup, text)
+                if value is None:
+                    value = text # unquoted string of the old format
+        elif kind == 'num':
+            value = float(text) if text.lstrip('+-') in {'inf', 'nan'} \
+                else literal_eval(text)
+        elif kind == 'str':
+            value = literal_eval(text)
         else:
-            kwarg_items = ()
+            raise ValueError('unexpected %r in %r' % (text, string))
 
-        if lispstyle:
-            pattern = '({name}{sep1}{args}{sep2}{kwargs})'
+        frame = frames[-1]
+        if frame[3] is None:
+            frame[1].append(value)
+        else:
+            frame[2][frame[3]] = value
+            frame[3] = None
+
+    if len(frames) != 1 or len(frames[0][1]) != 1:
+        raise ValueError('not a single expression: %r' % string)
+    return frames[0][1][0]
+
+
+def _resolve(lookup, name):
+    op = _lookup(lookup, name)
+    if op is None:
+        raise KeyError('unknown operation %r' % name)
+    return op
+
+
+def _lookup(lookup, name):
+    try:
+        return lookup(name)
+    except KeyError:
+        return None
+
+
+# --------------------------- binary encoding ------------------------------- #
+
+# Instances are written in preorder. Operations and strings are written
+# once and referred to by their index afterwards, values of other types
+# are pickled.
+
+def dumps(instance):
+    """Encodes an instance as bytes (see loads)."""
+    out = bytearray()
+    refs = {} # (kind, value) -> index
+    stack = [instance]
+    in_progress = set()
+
+    def ref(kind, value, code):
+        key = kind, value
+        if key in refs:
+            out.append(ord('r'))
+            _write_varint(out, refs[key])
+            return
+        refs[key] = len(refs)
+        out.append(ord(code))
+        data = value.encode()
+        _write_varint(out, len(data))
+        out.extend(data)
+
+    while stack:
+        item = stack.pop()
+        if type(item) is _End:
+            in_progress.discard(item.key)
+            continue
+
+        if type(item) is Apply:
+            if id(item) in in_progress:
+                raise ValueError('cannot encode recursive structures')
+            in_progress.add(id(item))
+            dom = item.domain
+            out.append(ord('A'))
+            _write_varint(out, len(dom.args))
+            _write_varint(out, len(dom.kwargs))
+            for key in dom.kwargs:
+                ref('s', key, 's')
+            stack.append(_End(id(item)))
+            stack.extend(reversed(dom.kwargs.values()))
+            stack.extend(reversed(dom.args))
+            stack.append(item.operation)
+        elif isinstance(item, Operation) and lookup_operation(item.name) is item:
+            ref('o', item.name, 'o')
+        elif item is None or item is True or item is False:
+            out.append(ord({None : 'N', True : 'T', False : 'F'}[item]))
+        elif type(item) is int and -2**63 <= item < 2**63:
+            out.append(ord('i'))
+            _write_varint(out, (item << 1) ^ (item >> 63)) # zigzag
+        elif type(item) is float:
+            out.append(ord('f'))
+            out.extend(struct.pack('<d', item))
+        elif type(item) is str:
+            ref('s', item, 's')
+        else:
+            data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+            out.append(ord('p'))
+            _write_varint(out, len(data))
+            out.extend(data)
+
+    return bytes(out)
+
+
+class _End:
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+
+def loads(data, env=None):
+    """Decodes an instance encoded with dumps."""
+    lookup = lookup_operation if env is None else env.__getitem__
+    refs = []
+    pos = 0
+    # frames of Apply nodes: [keys, number of values missing, values]
+    frames = []
+
+    while True:
+        code = data[pos]
+        pos += 1
+
+        if code == _APPLY:
+            nargs, pos = _read_varint(data, pos)
+            nkwargs, pos = _read_varint(data, pos)
+            keys = []
+            for _ in range(nkwargs):
+                key, pos = _read_ref(data, pos, refs, lookup)
+                keys.append(key)
+            frames.append([keys, nargs + nkwargs + 1, []])
+            continue
+
+        if code == _INT:
+            value, pos = _read_varint(data, pos)
+            value = (value >> 1) ^ -(value & 1)
+        elif code == _FLOAT:
+            value, = _unpack_float(data, pos)
+            pos += 8
+        elif code in _SINGLETONS:
+            value = _SINGLETONS[code]
+        elif code == _PICKLE:
+            size, pos = _read_varint(data, pos)
+            value = pickle.loads(data[pos:pos+size])
+            pos += size
+        else:
+            value, pos = _read_ref(data, pos - 1, refs, lookup)
+
+        # complete the Apply nodes whose last value was read
+        while frames:
+            frame = frames[-1]
+            frame[2].append(value)
+            frame[1] -= 1
+            if frame[1]:
+                break
+            frames.pop()
+            keys, _, values = frame
+            op = values[0]
+            nargs = len(values) - len(keys)
+            value = Apply._make(op, FrozenParameterList._make(
+                tuple(values[1:nargs]),
+                dict(zip(keys, values[nargs:])) if keys else EMPTY_KWARGS))
         else:
-            pattern = '{name}({sep1}{args}{sep2}{kwargs})'
+            break
 
-        return pattern.format(
-            name = op_name,
-            sep1 = sep if lispstyle else '',
-            args = sep.join(arg_vals),
-            sep2 = sep if arg_vals and kwarg_items else '',
-            kwargs = sep.join(kwarg_items),
-        )
-    elif str(type(param)) == "<class 'numpy.ndarray'>":
-        return 'ndarray%s'% (param.shape,)
-    else:
-        return str(param)
+    if pos != len(data):
+        raise ValueError('trailing data')
+    return value
+
+
+_APPLY, _INT, _FLOAT, _PICKLE = b'Aifp'
+_SINGLETONS = {ord('N') : None, ord('T') : True, ord('F') : False}
+_unpack_float = struct.Struct('<d').unpack_from
+
+
+def _read_ref(data, pos, refs, lookup):
+    code = data[pos]
+    pos += 1
+    if code == _REF:
+        index, pos = _read_varint(data, pos)
+        return refs[index], pos
+    size, pos = _read_varint(data, pos)
+    value = data[pos:pos+size].decode()
+    pos += size
+    if code == _OPERATION:
+        value = _resolve(lookup, value)
+    elif code != _STRING:
+        raise ValueError('unknown code %r' % chr(code))
+    refs.append(value)
+    return value, pos
+
+
+_REF, _OPERATION, _STRING = b'ros'
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
 
 
 def pformat(param, linebreaks=True, str_func=str):
-    stack = []
     prefix = ' '*4
     sep1 = '\n' if linebreaks else ''
     sep2 = '\n' if linebreaks else ' '
     sep3 = ',\n' if linebreaks else ''
     sep4 = ' = '  if linebreaks else '='
 
-    def go_deeper(param):
-        log.debug('paramtype:%s' % type(param))
+    def expands(param):
         if not isinstance(param, Apply):
-            return str_func(param)
+            return False
+        return any(isinstance(v, Parameter) for v in param.domain)
 
-        only_values = all(
-            not isinstance(v, Parameter)
-            for v in param.domain)
+    def go_deeper(param):
+        if expands(param):
+            return tuple(param.domain.values())
+        return ()
 
-        if only_values:
+    def visit(param, results):
+        log.debug('paramtype:%s' % type(param))
+        if not expands(param):
             return str_func(param)
 
-        if param in stack:
-            return type(param).__name__ + ' ...'
-
-        stack.append(param)
-
-        args = [
-            go_deeper(arg)
-            for arg in param.domain.args
-        ]
+        num_args = len(param.domain.args)
+        args = results[:num_args]
         args += [
-            k + sep4 + go_deeper(v)
-            for k,v in param.domain.kwargs.items()
+            k + sep4 + v
+            for k, v in zip(sorted(param.domain.kwargs), results[num_args:])
         ]
 
         args = (',' + sep2).join(args)
@@ -95,10 +402,12 @@ def pformat(param, linebreaks=True, str_func=str):
             args = textwrap.indent(args, prefix)
 
         out = param.operation.name, '(', sep1, args, sep3, ')'
-        stack.pop()
         return ''.join(out)
 
-    return go_deeper(param)
+    def cycle(param):
+        return type(param).__name__ + ' ...'
+
+    return fold(param, visit, go_deeper, cycle=cycle)
 
 
 def pformat_apply(param):
@@ -1,32 +1,26 @@
 from .spaces import Apply, Operation, Parameter
 from .domains import ParameterList
+from .hashing import structural_hash, maybe_intern
+from .traversal import fold, preorder
 
 
 def simplify(param):
 
     recursion_tracker = {}
 
-    def _simplify(param):
+    def _simplify(param, results):
         if type(param) != Apply:
             return param
-        if id(param) in recursion_tracker:
-            return param
-
-        recursion_tracker[id(param)] = None
 
         op = param.operation
-        dom = ParameterList.from_items(
-            zip(
-                param.domain.keys(),
-                map(_simplify, param.domain.values())
-            )
-        )
+        if isinstance(op, Parameter):
+            op, *results = results
+        dom = ParameterList.from_items(zip(param.domain.keys(), results))
 
         if isinstance(op, Operation):
             if {'variadic', 'associative'}.issubset(op.properties):
-                for D in dom:
-                    if type(D) == Apply and D.operation == op:
-                        dom = join_same_child_operations(op, dom)
+                if any(type(D) == Apply and D.operation == op for D in dom):
+                    dom = join_same_child_operations(op, dom)
 
             if 'idempotent' in op.properties:
                 dom = delete_duplicate_children(op, dom)
@@ -34,19 +28,23 @@ def simplify(param):
             if 'commutative' in op.properties:
                 ...
 
-        elif isinstance(op, Parameter):
-            op = _simplify(op)
+        return Apply(op, dom)
 
-        else:
-            pass
+    # nodes reached again within a cycle stay, replace_nodes exchanges
+    # them with their simplified versions afterwards
+    simpler = fold(param, _simplify, _children,
+        memo=recursion_tracker, cycle=lambda param : param)
+    simpler = replace_nodes(simpler, recursion_tracker)
+    return maybe_intern(simpler)
 
-        new = Apply(op, dom)
-        recursion_tracker[id(param)] = new
-        return new
 
-    simpler = _simplify(param)
-    simpler = replace_nodes(simpler, recursion_tracker)
-    return simpler
+def _children(param):
+    if type(param) != Apply:
+        return ()
+    dom = param.domain
+    if isinstance(param.operation, Parameter):
+        return (param.operation, *dom.values())
+    return tuple(dom.values())
 
 
 def replace_nodes(param, tracker):
@@ -55,9 +53,19 @@ def replace_nodes(param, tracker):
     if id(param) in tracker:
         return tracker[id(param)]
 
-    for k,D in param.domain.items():
-        D = replace_nodes(D, tracker)
-        param.domain[k] = D
+    def _children(param):
+        if id(param) in tracker:
+            return ()
+        return [D for D in param.domain.values() if isinstance(D, Apply)]
+
+    for node in preorder(param, _children, unique=True):
+        if id(node) in tracker:
+            continue
+        for k,D in node.domain.items():
+            new = tracker.get(id(D), D) if isinstance(D, Apply) else D
+            if new is not D:
+                node.domain[k] = new
+                Parameter.mutations += 1 # invalidates cached digests
 
     return param
 
@@ -75,10 +83,17 @@ def join_same_child_operations(op, dom):
 
 
 def delete_duplicate_children(op, dom):
-    """Does not touch keyword arguments ..."""
+    """
+    Removes structurally equal arguments.
+
+    Does not touch keyword arguments ...
+    """
     args = []
+    seen = set()
     for val in dom.args:
-        if val not in args:
+        digest = structural_hash(val)
+        if digest not in seen:
+            seen.add(digest)
             args.append(val)
     dom = ParameterList(args, dom.kwargs)
     return dom
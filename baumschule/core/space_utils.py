@@ -6,6 +6,7 @@ from .domains import Interval, ParameterList
 from .spaces import (
     Apply, Combination, Primitive, Parameter, prod, join,
     Categorical, Discrete, Continuous)
+from .traversal import fold, preorder
 
 
 def expand(search_space, index_vector, include_primitives=False):
@@ -18,25 +19,17 @@ def expand(search_space, index_vector, include_primitives=False):
 
     index_iter = iter(index_vector)
 
-    def _expand(search_space):
+    def visit(search_space, results):
         if type(search_space) == Apply:
             dom = search_space.domain
             op = search_space.operation
-            if isinstance(op, Combination):
-                if op == join:
-                    # TODO get a problem here, if indexed by key!!
-                    return dom[next(index_iter)]
-                else:
-                    raise NotImplementedError(
-                        'Join only as combination allowed.')
-            else:
-                if isinstance(op, Apply):
-                    op = _expand(op)
-
-                chosen_values = map(_expand, dom.values())
-                params = zip(dom.keys(), chosen_values)
-                dom = ParameterList.from_items(params)
-                return Apply(op, dom)
+            if op == join:
+                # TODO get a problem here, if indexed by key!!
+                return dom[next(index_iter)]
+            if isinstance(op, Apply):
+                op, *results = results
+            dom = ParameterList.from_items(zip(dom.keys(), results))
+            return Apply(op, dom)
 
         elif isinstance(search_space, Primitive):
             if include_primitives:
@@ -50,7 +43,24 @@ def expand(search_space, index_vector, include_primitives=False):
         else:
             raise NotImplementedError('Not a parameter.')
 
-    return _expand(search_space)
+    from .hashing import maybe_intern
+    return maybe_intern(fold(search_space, visit, _choice_children))
+
+
+def _choice_children(search_space):
+    """Subspaces that may contain choice points, in index order."""
+    if type(search_space) != Apply:
+        return ()
+    op = search_space.operation
+    if isinstance(op, Combination):
+        if op == join:
+            return ()
+        raise NotImplementedError('Only join as combination allowed.')
+    dom = search_space.domain
+    dom = tuple(dom.values())
+    if isinstance(op, Apply):
+        return (op, *dom)
+    return dom
 
 
 def fc_shape(search_space, include_primitives=True):
@@ -58,32 +68,14 @@ def fc_shape(search_space, include_primitives=True):
     Returns the flat choice shape of a search space.
 
     """
-    _fc_shape = lambda ss : fc_shape(ss, include_primitives)
-
     shape = []
-    if type(search_space) == Apply:
-        dom = search_space.domain
-        op = search_space.operation
-        if isinstance(op, Combination):
-            if op == join:
-                shape.append(len(dom))
-            else:
-                raise NotImplementedError('Only join as combination allowed.')
-        else:
-            if isinstance(op, Apply):
-                subshapes = _fc_shape(op)
-                shape.extend(subshapes)
-
-            subshapes = map(_fc_shape, dom)
-            shape.extend(chain(*subshapes))
-
-    elif isinstance(search_space, Primitive):
-        if include_primitives:
-            shape.append(len(search_space))
-
-    else:
-        pass
-
+    for subspace in preorder(search_space, _choice_children):
+        if type(subspace) == Apply:
+            if subspace.operation == join:
+                shape.append(len(subspace.domain))
+        elif isinstance(subspace, Primitive):
+            if include_primitives:
+                shape.append(len(subspace))
     return tuple(shape)
 
 
@@ -91,15 +83,19 @@ def get_crown(search_space, include_primitives=True):
     crown = []
     indices = []
 
-    def _find_choice_points(subspace, index):
+    stack = [(search_space, ())]
+    while stack:
+        subspace, index = stack.pop()
         is_cp = False
         if isinstance(subspace, Apply):
             if subspace.operation == join:
                 is_cp = True
             else:
-                _find_choice_points(subspace.operation, (*index, -1))
-                for i, subs in enumerate(subspace.domain):
-                    _find_choice_points(subs, (*index, i))
+                subs = [(subspace.operation, (*index, -1))]
+                subs += [
+                    (sub, (*index, i))
+                    for i, sub in enumerate(subspace.domain)]
+                stack.extend(reversed(subs))
         elif isinstance(subspace, Primitive) and include_primitives:
             is_cp = True
 
@@ -107,7 +103,6 @@ def get_crown(search_space, include_primitives=True):
             crown.append(subspace)
             indices.append(index)
 
-    _find_choice_points(search_space, ())
     return crown, indices
 
 
@@ -128,6 +123,59 @@ def get_subspace(subspace, index, index_expansion=True):
     return subspace
 
 
+def substitute(search_space, indices, values):
+    """
+    Returns a copy of a space with the subspaces at indices
+    (see get_crown and get_subspace) replaced by values.
+
+    Subtrees without replacements are shared with the original space.
+    """
+    replacements = dict(zip(indices, values))
+    prefixes = {index[:i] for index in indices for i in range(len(index))}
+
+    def _substitute(subspace, index):
+        if index in replacements:
+            return replacements[index]
+        if index not in prefixes or type(subspace) != Apply:
+            return subspace
+
+        op = _substitute(subspace.operation, (*index, -1))
+        dom = subspace.domain
+        vals = (
+            _substitute(val, (*index, i))
+            for i, val in enumerate(dom.values()))
+        return Apply(op, ParameterList.from_items(zip(dom.keys(), vals)))
+
+    return _substitute(search_space, ())
+
+
+def get_cached(space, name, func):
+    """
+    Returns func(space), the result is cached on the space.
+
+    Cached results are recomputed after any space was mutated with <<=.
+    """
+    cache = getattr(space, '_cache', None)
+    if cache is None:
+        cache = space._cache = {}
+    else:
+        cached = cache.get(name)
+        if cached is not None and cached[0] == Parameter.mutations:
+            return cached[1]
+    value = func(space)
+    cache[name] = (Parameter.mutations, value)
+    return value
+
+
+def peek_cached(space, name):
+    """Returns the result cached by get_cached, None if there is none."""
+    cache = getattr(space, '_cache', None)
+    cached = cache.get(name) if cache else None
+    if cached is not None and cached[0] == Parameter.mutations:
+        return cached[1]
+    return None
+
+
 def to_space(arg):
     """
     Convert nested structures to treefarm spaces.
@@ -141,7 +189,9 @@ def to_space(arg):
         if converts_to_primitive(arg):
             return Categorical(arg)
         else:
-            return join(*arg)
+            # children in the same order in every process
+            from .hashing import canonical_order
+            return join(*canonical_order(arg))
     if type(arg) == Interval:
         if arg.step == 0:
             return Continuous(arg)
@@ -169,24 +219,28 @@ def converts_to_primitive(arg):
             return False
     return True
 
-def is_recursive(space, parents=()):
-
-    # switching the first and the second if statement
-    # causes a crash for numpy values for some reason
+def is_recursive(space):
+    """
+    Whether a cycle can be reached from space.
 
+    Depth first search with colour marking (nodes in progress and nodes
+    done), linear in the number of nodes. The result is cached on space
+    until the next mutation with <<=.
+    """
     if type(space) != Apply:
         return False
+    return get_cached(space, 'recursive', _find_cycle)
 
-    if space in parents:
-        return True
 
-    parents += (space,)
+def _find_cycle(space):
+    def visit(node, results):
+        return any(results)
 
-    if is_recursive(space.operation, parents):
-        return True
+    return fold(space, visit, _apply_children, memo={}, cycle=lambda _ : True)
 
-    for sub in space.domain.values():
-        if is_recursive(sub, parents):
-            return True
 
-    return False
+def _apply_children(node):
+    if type(node) != Apply:
+        return ()
+    dom = node.domain
+    return (node.operation, *dom.values())
@@ -10,8 +10,10 @@ log.setLevel('INFO')
 
 
 class Callable:
+    __slots__ = ()
+
     def __call__(self, *args, **kwargs):
-        log.debug('call: %s %s' % (args, kwargs))
+        log.debug('call: %s %s', args, kwargs)
 
         # convert argument values to spaces
         if args:
@@ -27,8 +29,19 @@ class Callable:
 
 class Parameter(Callable):
     # not callable yet
+
+    # _cache holds results of space_utils.get_cached,
+    # _interned marks nodes shared by hashing.intern
+    __slots__ = (
+        'domain', 'dist', 'name', 'symbol', '_cache', '_interned',
+        '__weakref__')
+
+    # counts in-place mutations (<<=) of all spaces, results cached on
+    # nodes are only valid as long as this number does not change
+    mutations = 0
+
     def __init__(self, domain, *, dist=None, name=None, symbol=None):
-        log.debug('domain: %s' % domain)
+        log.debug('domain: %s', domain)
 
         if isinstance(domain, Parameter):
             raise ValueError('Domain cannot be a Space!')
@@ -38,6 +51,17 @@ class Parameter(Callable):
         self.name = name
         self.symbol = symbol
 
+    def __getstate__(self):
+        # results cached on the node (compiled samplers, ...) are dropped,
+        # copies are not interned
+        return {
+            key : getattr(self, key) for key in _state_slots(type(self))
+            if hasattr(self, key)}
+
+    def __setstate__(self, state):
+        for key, val in state.items():
+            object.__setattr__(self, key, val)
+
     def __contains__(self, element):
         # TODO This needs to be much more sophisticated!
         for D in self.domain:
@@ -84,37 +108,68 @@ class Parameter(Callable):
         return apply(self, *args, **kwargs)
 
 
+def _state_slots(cls):
+    """Returns the slots of a node class that are pickled."""
+    return [
+        key for c in cls.__mro__ for key in getattr(c, '__slots__', ())
+        if key not in {'_cache', '_interned', '__weakref__'}]
+
+
 class Apply(Parameter):
+    __slots__ = ('operation',)
+
     def __init__(self, operation, *args, **kwargs):
-        log.debug('create apply: %s' % operation)
+        log.debug('create apply: %s', operation)
         super().__init__(*args, **kwargs)
         self.operation = operation
 
+    @classmethod
+    def _make(cls, operation, domain):
+        """Creates an instance without checks, used for sampled trees."""
+        self = cls.__new__(cls)
+        self.domain = domain
+        self.dist = self.name = self.symbol = None
+        self.operation = operation
+        return self
+
     def __lshift__(self, arg):
+        self._check_mutable()
         self.domain << arg
+        Parameter.mutations += 1
 
     def __rshift__(self, arg):
         arg << self.domain
 
     def __ilshift__(self, arg):
+        self._check_mutable()
         self.domain << arg
+        Parameter.mutations += 1
         return self
 
+    def _check_mutable(self):
+        # interned nodes are shared by several trees (see hashing.intern)
+        if getattr(self, '_interned', False):
+            raise TypeError('interned %s cannot be mutated' % type(self).__name__)
+
     def __irshift__(self, arg):
         raise TypeError('unsupported operand type(s) for =<<: %r and %r'
             % (type(self), type(arg)))
 
 
 class Primitive(Parameter):
-    pass
+    __slots__ = ()
     """def __len__(self):
         return len(self.domain)"""
 
 class Categorical(Primitive):
+    __slots__ = ()
+
     def __str__(self):
         return '{' + ','.join(str(D) for D in self.domain) + '}'
 
 class Discrete(Primitive):
+    __slots__ = ()
+
     def __str__(self):
         if type(self.domain) == Interval:
             return str(self.domain)
@@ -123,13 +178,17 @@ class Discrete(Primitive):
         return out
 
 class Continuous(Primitive):
+    __slots__ = ()
+
     def __str__(self):
         return str(self.domain)
 
 class Constant(Primitive):
-    pass
+    __slots__ = ()
 
 class Operation(Callable):
+    __slots__ = (
+        'func', 'name', 'properties', 'symbol', 'notation', 'dist', 'pure')
 
     NOTATIONS = {'prefix', 'postfix', 'infix', 'name'}
 
@@ -137,9 +196,12 @@ class Operation(Callable):
         properties=None,
         notation=None,
         symbol=None,
-        dist=None):
+        dist=None,
+        pure=True):
         """
         symbol : Tripel or str the form of (left, sep, right)
+        pure : bool
+            the result only depends on the arguments, so it may be cached
         """
 
         if notation is None:
@@ -155,6 +217,7 @@ class Operation(Callable):
         self.symbol = symbol
         self.notation = notation
         self.dist = dist
+        self.pure = pure
 
     def __str__(self):
         return self.name
@@ -165,6 +228,13 @@ class Operation(Callable):
     def __matmul__(self, arg):
         return self(arg)
 
+    def __reduce_ex__(self, protocol):
+        # builtin and environment operations are pickled by name,
+        # so identity checks (e.g. op == quote) hold after unpickling
+        if lookup_operation(self.name) is self:
+            return lookup_operation, (self.name,)
+        return super().__reduce_ex__(protocol)
+
     """def __call__(self, arg):
         apply_obj = super().__call__(arg)
         apply_obj.dist = self.dist
@@ -177,6 +247,8 @@ class Combination(Operation):
     Combinations ether represent a structure themselfs or are replaced by
     structures before the evaluation of other operations.
     """
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -207,7 +279,7 @@ def intersect_func(*args, **kwargs):
 def prod_func(*args, **kwargs):
     new_args = []
     for a in args:
-        if type(a) == ParameterList:
+        if isinstance(a, ParameterList):
             new_args.extend(a)
         else:
             new_args.append(a)
@@ -272,5 +344,16 @@ apply = Operation(
     name = 'apply'
 )
 
+BUILTIN_OPERATIONS = {
+    o.name : o for o in (join, intersect, prod, power, quote, apply)}
+
+
+def lookup_operation(name):
+    """Returns the builtin or environment operation with the given name."""
+    if name in BUILTIN_OPERATIONS:
+        return BUILTIN_OPERATIONS[name]
+    return get_env().get(name)
+
+
 # --- very dirty this is ---
 from .space_utils import to_space
@@ -1,8 +1,6 @@
 import logging
 import random
 
-import graphviz
-
 from .spaces import (
     Parameter,
     Operation,
@@ -12,6 +10,7 @@ from .spaces import (
     Apply)
 from .environment import get_config
 from .domains import Interval, ParameterList
+from .traversal import preorder
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
@@ -21,6 +20,7 @@ schemes = c.colors
 
 
 def todot(param, color_scheme='light'):
+    import graphviz # optional dependency, imported on first use
 
     global colors
     colors = schemes[color_scheme]
@@ -63,7 +63,8 @@ def todot(param, color_scheme='light'):
         ('edges' in styles and styles['edges']) or {}
     )
 
-    _to_dot_recursive(param, graph, recursion_tracker=[])
+    for node in preorder(param, _dot_children, unique=True):
+        _to_dot(node, graph)
 
     graph.node('root', style='filled', shape='point',
         color=styles['graph']['bgcolor'], fillcolor=styles['graph']['bgcolor'])
@@ -72,26 +73,32 @@ def todot(param, color_scheme='light'):
     return graph
 
 
-def _to_dot_recursive(param, graph, recursion_tracker):
-    assert id(param) not in recursion_tracker, \
-        'Recursion:%s:%s' % (type(param), type(graph))
+def _dot_children(param):
+    """Nodes painted for the edges of param."""
+    if not isinstance(param, Apply):
+        return ()
+    children = tuple(param.domain.values())
+    if isinstance(param.operation, Parameter):
+        children += (param.operation,)
+    return children
 
-    recursion_tracker.append(id(param))
 
+def _to_dot(param, graph):
+    """Paints one node, its children are painted separately."""
     if not isinstance(param, Parameter):
         _value_to_dot(param, graph)
     elif isinstance(param, Primitive):
         _primitive_to_dot(param, graph)
     elif isinstance(param.operation, Parameter):
         #if 'associative' in param.operation.operation.properties:
-        # _paint_associative_record(param, graph, recursion_tracker)
+        # _paint_associative_record(param, graph)
         #else:
-        _paint_record_composed(param, graph, recursion_tracker)
+        _paint_record_composed(param, graph)
     else:
         if 'associative' in param.operation.properties:
-            _paint_associative_node(param, graph, recursion_tracker)
+            _paint_associative_node(param, graph)
         else:
-            _paint_record(param, graph, recursion_tracker)
+            _paint_record(param, graph)
 
 
 def _primitive_to_dot(param, graph):
@@ -157,7 +164,7 @@ def get_value_label(param):
         label = str(param)
     return label
 
-def _paint_associative_node(param, graph, recursion_tracker):
+def _paint_associative_node(param, graph):
     label_parts = []
     new_edges = []
     parent_node_id = 'N' + str(id(param))
@@ -182,9 +189,6 @@ def _paint_associative_node(param, graph, recursion_tracker):
 
     for element in param.domain:
 
-        if id(element) not in recursion_tracker:
-            _to_dot_recursive(element, graph, recursion_tracker)
-
         if _gets_record_shape(element):
             subnode_id = 'N' + str(id(element)) + ':out:s'
         else:
@@ -193,17 +197,13 @@ def _paint_associative_node(param, graph, recursion_tracker):
         graph.edge(parent_node_id, subnode_id)
 
 
-def _paint_record(param, graph, recursion_tracker):
+def _paint_record(param, graph):
     label_parts = []
     new_edges = []
     parent_node_id = 'N' + str(id(param))
 
     for key, element in param.domain.items():
 
-        # paint nodes of containing parameters
-        if id(element) not in recursion_tracker:
-            _to_dot_recursive(element, graph, recursion_tracker)
-
         if _gets_record_shape(element):
             subnode_id = 'N' + str(id(element)) + ':out:s'
         else:
@@ -247,7 +247,7 @@ def _gets_record_shape(param):
 # ------ Funtions for composed operations ------ #
 
 
-def _paint_record_composed(param, graph, recursion_tracker):
+def _paint_record_composed(param, graph):
     label_parts = []
     new_edges = []
     parent_node_id = 'N' + str(id(param))
@@ -255,10 +255,6 @@ def _paint_record_composed(param, graph, recursion_tracker):
     # paint domain
     for key, element in param.domain.items():
 
-        # paint nodes of containing parameters
-        if id(element) not in recursion_tracker:
-            _to_dot_recursive(element, graph, recursion_tracker)
-
         if _gets_record_shape(element):
             subnode_id = 'N' + str(id(element)) + ':out:s'
         else:
@@ -277,9 +273,8 @@ def _paint_record_composed(param, graph, recursion_tracker):
         #if type(key) is int: key = ""#'"#'⛀'#'🌕'#'▔' # ⫰
         label_parts.append('<%s> %s' % (cell_label, key))
 
-    # paint operator
+    # link operator
     op = param.operation
-    _to_dot_recursive(op, graph, recursion_tracker)
     if _gets_record_shape(element):
         subnode_id = 'N' + str(id(op)) + ':out:s'
         shape = 'record'
@@ -0,0 +1,120 @@
+"""
+Traversals of parameter trees with an explicit stack.
+
+Deep trees, e.g. samples of recursive grammars, don't hit the recursion
+limit and there is no frame overhead per node.
+"""
+from .spaces import Apply
+
+
+def children(node):
+    """The operation and the domain values of Apply nodes."""
+    if type(node) is Apply:
+        dom = node.domain
+        return (node.operation, *dom.values())
+    return ()
+
+
+def preorder(root, children=children, unique=False):
+    """
+    Iterates over root and its descendants, parents before children.
+
+    unique : bool
+        visit every node once, also needed for cyclic structures
+    """
+    stack = [root]
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if unique:
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+        yield node
+        stack.extend(reversed(children(node)))
+
+
+def postorder(root, children=children, unique=False):
+    """Iterates over root and its descendants, children before parents."""
+    stack = [(root, False)]
+    seen = set()
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        if unique:
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+        stack.append((node, True))
+        stack.extend((c, False) for c in reversed(children(node)))
+
+
+_EXIT = object()
+
+
+def fold(root, visit, children=children, memo=None, key=id, cycle=None):
+    """
+    Computes visit(node, results) for root and its descendants, where
+    results are those of the children of node.
+
+    memo : mapping
+        results by key(node), looked up before a node is expanded and
+        updated after it was visited; nodes whose key is None are not
+        memoized (e.g. a dict or an EvaluationCache)
+    cycle : function
+        called with a node that is reached again from inside itself,
+        returns its result; a ValueError is raised if not given
+    """
+    stack = [root]
+    push, pop = stack.append, stack.pop
+    results = []
+    store = results.append
+    in_progress = set()
+
+    while stack:
+        node = pop()
+
+        if node is _EXIT:
+            node, num, k = pop()
+            args = results[-num:]
+            del results[-num:]
+            result = visit(node, args)
+            in_progress.discard(id(node))
+            if k is not None:
+                memo[k] = result
+            store(result)
+            continue
+
+        k = None
+        if memo is not None:
+            k = key(node)
+            if k is not None:
+                try:
+                    store(memo[k])
+                    continue
+                except KeyError:
+                    pass
+
+        kids = children(node)
+        if not kids:
+            result = visit(node, ())
+            if k is not None:
+                memo[k] = result
+            store(result)
+            continue
+
+        if id(node) in in_progress:
+            if cycle is None:
+                raise ValueError('cyclic structure')
+            store(cycle(node))
+            continue
+
+        in_progress.add(id(node))
+        push((node, len(kids), k))
+        push(_EXIT)
+        stack.extend(reversed(kids))
+
+    result, = results
+    return result
@@ -1,3 +1,8 @@
+import gc
+from contextlib import contextmanager
+from importlib import import_module
+from fractions import Fraction
+
 import numpy as np
 
 def execfile(fname, glob=None, loc=None, compiler=None):
@@ -12,25 +17,85 @@ def execfile(fname, glob=None, loc=None, compiler=None):
         exec(compiler(f.read(), fname, 'exec'), glob, loc)
 
 
+@contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic garbage collector.
+
+    Building large acyclic trees otherwise triggers full collections,
+    which scan every object of the (heavily populated) interpreter.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def import_object(path):
+    """
+    Imports an object given by its dotted path, e.g. 'pandas.read_csv'.
+
+    Used for configuration entries that are only imported when needed.
+    """
+    module, _, name = path.rpartition('.')
+    return getattr(import_module(module), name)
+
+
+class CodeWriter:
+    """
+    Base of the generators of Python functions for trees (see
+    computing_engine.Plan and encoding.Encoding). Values are referred to
+    by the names of constants in the namespace of the function.
+    """
+
+    constant_prefix = 'c'
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.count = 0
+
+    def name(self, prefix):
+        self.count += 1
+        return '%s%s' % (prefix, self.count)
+
+    def constant(self, value):
+        name = self.name(self.constant_prefix)
+        self.constants[name] = value
+        return name
+
+    @staticmethod
+    def function_source(name, arg, body):
+        """Source of a function name(arg) with the statements body."""
+        return 'def %s(%s):\n%s' % (
+            name, arg, ''.join('    %s\n' % l for l in body))
+
+
+def decimal_fraction(x):
+    """
+    Returns x as Fraction, floats are taken as the decimal number they
+    are printed as (0.1 is 1/10).
+    """
+    if type(x) is float or isinstance(x, np.floating):
+        return Fraction(repr(float(x)))
+    return Fraction(x)
+
+
 def divisible(num, denum):
-    # TODO: do without loop
-    while denum % 1:
-        num *= 10
-        denum *= 10
-    return not (num % denum)
+    """Whether num is an integer multiple of denum, see decimal_fraction."""
+    return not (decimal_fraction(num) % decimal_fraction(denum))
 
 def get_minium_perfs(protocol):
-    if type(protocol) == StandardProtocol:
-        perfs = list(protocol.to_dataframe()['perf'])
+    """Returns the best performance up to each record."""
+    if isinstance(protocol, ColumnarProtocol):
+        return protocol.minium_perfs()
+    if isinstance(protocol, StandardProtocol):
+        perfs = [record.perf for record in protocol]
     else:
         perfs = protocol
+    return np.minimum.accumulate(np.asarray(perfs, dtype=float))
 
-    a = [perfs[0]]
-    for p in perfs[0:]:
-         if p < a[-1]:
-             a.append(p)
-         else:
-             a.append(a[-1])
-    return np.array(a)
-
-from .protocol import StandardProtocol
+from .protocol import StandardProtocol, ColumnarProtocol
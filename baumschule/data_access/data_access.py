@@ -2,11 +2,13 @@ from itertools import chain
 from collections import defaultdict
 from functools import partial
 import os
+import sys
 from glob import iglob
 import logging
 
 from . import utils
 from ..core.environment import get_config
+from ..core.utils import import_object
 
 log = logging.getLogger(__name__)
 logging.basicConfig()
@@ -264,6 +266,8 @@ class LocalFile(LocalPath, File):
         LocalPath.__init__(self, source, parts)
 
         self.reader = self.read_functions.get(self.filetype, None)
+        if type(self.reader) is str:
+            self.reader = import_object(self.reader)
 
 
     def read(self):
@@ -272,8 +276,9 @@ class LocalFile(LocalPath, File):
         return self.reader(self.real_path)
 
     def write(self, obj):
-        if type(obj) in self.write_functions:
-            write = self.write_functions[type(obj)]
+        write_functions = self._resolved_write_functions()
+        if type(obj) in write_functions:
+            write = write_functions[type(obj)]
         else:
             # find valid writers
             valid_writers = tuple(
@@ -285,12 +290,29 @@ class LocalFile(LocalPath, File):
             if len(valid_writers) == 0:
                 raise ValueError('No writer for object type:%s' % type(obj))
             elif len(valid_writers) == 1:
-                write = self.write_functions[valid_writers[0]]
+                write = write_functions[valid_writers[0]]
             else:
-                raise ValueError('Ambigous write functions for type %s: %s' % type(obj), valid_writers)
+                raise ValueError('Ambigous write functions for type %s: %s' % (type(obj), valid_writers))
 
+        if type(write) is str:
+            write = import_object(write)
         return write(self.real_path, obj)
 
+    @classmethod
+    def _resolved_write_functions(cls):
+        """
+        write_functions with types given by dotted path imported, types
+        of modules that are not imported yet can't have instances.
+        """
+        functions = {}
+        for typ, write in cls.write_functions.items():
+            if type(typ) is str:
+                if typ.rpartition('.')[0] not in sys.modules:
+                    continue
+                typ = import_object(typ)
+            functions[typ] = write
+        return functions
+
 
 class LocalDirectory(LocalPath, Group):
 
@@ -1,33 +1,42 @@
 import numpy as np
-import scipy.io  # this is the SciPy module that loads mat-files
 from datetime import datetime, date, time
-import pandas as pd
 import os
-import subprocess
 from collections import namedtuple
 from itertools import chain
-import mimetypes
 import json
 
 import logging
 logger = logging.getLogger(__name__)
 
-try:
-    import magic
-except Exception as e:
-    logger.debug('No magic module available: %s' % e)
-    magic_available = False
-else:
-    magic_available = True
-
-# add mimetypes
 module_path = os.path.dirname(__file__)
 custom_types_file = os.path.join(module_path, 'mime.types')
-mimetypes.init(mimetypes.knownfiles + [custom_types_file])
+_magic = None
+
+
+def _init_filetypes():
+    """
+    Imports magic and adds the custom mimetypes, on the first call of
+    get_filetype instead of on import.
+    """
+    global _magic
+    if _magic is not None:
+        return
+    import mimetypes
+    try:
+        import magic
+    except Exception as e:
+        logger.debug('No magic module available: %s' % e)
+        _magic = False
+    else:
+        _magic = magic
+    mimetypes.init(mimetypes.knownfiles + [custom_types_file])
+
 
 def read_mat(path):
     """Reads a pandas.DataFrame from a matfile"""
     # source http://poquitopicante.blogspot.de/2014/05/loading-matlab-mat-file-into-pandas.html
+    import scipy.io  # this is the SciPy module that loads mat-files
+    import pandas as pd
     mat = scipy.io.loadmat(path)  # load mat-file
     mdata = mat['measuredData']  # variable in mat file
     mdtype = mdata.dtype  # dtypes of structures are "unsized objects"
@@ -48,6 +57,8 @@ def read_mat(path):
 
 
 def mat_to_csv(path):
+    import scipy.io
+    import pandas as pd
     d = scipy.io.loadmat(path)
     x = pd.DataFrame(d['X'], columns=['x'])
     y = pd.DataFrame(d['y'], columns=['y'])
@@ -58,6 +69,8 @@ def mat_to_csv(path):
 
 
 def mat_to_hdf(path):
+    import scipy.io
+    import pandas as pd
     d = scipy.io.loadmat(path)
     x = pd.DataFrame(d['X'])
     y = pd.DataFrame(d['y'])
@@ -88,23 +101,30 @@ def write_text(path, string):
         f.write(string)
 
 
+def write_csv(path, df):
+    df.to_csv(path)
+
+
 def get_filetype(path):
+    _init_filetypes()
 
     # get mimetype of file
     if not os.path.exists(path):
         mime_type = 'text/plain'
-    elif magic_available:
+    elif _magic:
         if os.path.isdir(path):
             mime_type = 'inode/directory'
         else:
-            mime_type = magic.from_file(path, mime=True)
+            mime_type = _magic.from_file(path, mime=True)
     else:
+        import subprocess
         cmd = 'file -b --mime-type'.split()
         cmd.append(path)
         mime_type = subprocess.check_output(cmd)
 
     # for unknown and text type, try to determine by file extension
     if mime_type in ['application/octet-stream', 'text/plain']:
+        import mimetypes
         type_, encoding = mimetypes.guess_type(path)
         if type_:
             mime_type = type_
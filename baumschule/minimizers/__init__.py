@@ -1,4 +1,20 @@
 
-from .flatgp import FlatGPMinimizer
-from .treegp import TreeGPMinimizer
+from importlib import import_module
+
 from .simple import RandomMinimizer, ExhaustiveMinimizer
+
+# the Gaussian process minimizers import GPy and scipy, which takes
+# seconds, they are imported on first access
+_LAZY = {
+    'FlatGPMinimizer' : '.flatgp',
+    'TreeGPMinimizer' : '.treegp',
+}
+
+__all__ = ['RandomMinimizer', 'ExhaustiveMinimizer', *_LAZY]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(import_module(_LAZY[name], __name__), name)
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name))
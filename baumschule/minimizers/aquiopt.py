@@ -0,0 +1,150 @@
+"""
+Optimizers of the aquisition function of the Gaussian process minimizers.
+"""
+import logging
+
+import numpy as np
+from scipy.optimize import minimize as scipy_minimize
+
+from ..core.spaces import quote
+from ..core.minimizer import minimize_func
+from ..core.space_utils import get_subspace
+from ..core.random_variables import sample
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+log.setLevel('INFO')
+
+
+class AquisitionOptimizer:
+    """
+    Searches the instance with the highest aquisition value.
+
+    minimizer : FlatMinimizer
+        provides search_space, transform_batch and aq_evaluations
+    """
+
+    def __init__(self, minimizer):
+        self.minimizer = minimizer
+
+    def maximize(self, aquisition, gradient=None):
+        """
+        Returns the best instance and its aquisition value.
+
+        aquisition : function
+            maps a matrix of transformed instances to aquisition values
+        gradient : function
+            maps a matrix of transformed instances to aquisition values
+            and their gradients (optional)
+        """
+        raise NotImplementedError()
+
+
+class RandomAquisitionOptimizer(AquisitionOptimizer):
+    """
+    Evaluates the aquisition function on one batch of random instances.
+
+    The batch is transformed into one matrix, so the model is queried
+    only once per update.
+    """
+
+    def maximize(self, aquisition, gradient=None):
+        minimizer = self.minimizer
+        instances = sample(minimizer.search_space, n=minimizer.aq_evaluations)
+        X = minimizer.transform_batch(instances)
+        aquivals = aquisition(X)
+        index = np.argmax(aquivals)
+        return instances[index], aquivals[index]
+
+
+class LBFGSAquisitionOptimizer(AquisitionOptimizer):
+    """
+    Multi-start L-BFGS-B in the transformed space.
+
+    Starts from the best of a batch of random instances and the best
+    instance found so far. One-hot coded categories are relaxed to [0, 1]
+    and discrete values to real numbers, the optima are mapped back to
+    valid instances with back_transform_batch.
+    """
+
+    def __init__(self, minimizer, num_starts=5, max_iter=100):
+        super().__init__(minimizer)
+        self.num_starts = num_starts
+        self.max_iter = max_iter
+
+    def maximize(self, aquisition, gradient=None):
+        minimizer = self.minimizer
+        instances = sample(minimizer.search_space, n=minimizer.aq_evaluations)
+        X = minimizer.transform_batch(instances)
+        aquivals = aquisition(X)
+
+        order = np.argsort(aquivals)[::-1]
+        starts = list(X[order[:self.num_starts]])
+        if minimizer.best_instance is not None:
+            starts.append(minimizer.transform(minimizer.best_instance))
+
+        # unbounded dimensions are limited to the range of the samples
+        bounds = [
+            (X[:, i].min() if lo is None else lo,
+             X[:, i].max() if hi is None else hi)
+            for i, (lo, hi) in enumerate(minimizer.transform_bounds())]
+
+        # all starts are optimized jointly, the objective is their sum and
+        # each evaluation queries the model once for all of them
+        starts = np.array(starts)
+        shape = starts.shape
+
+        if gradient is None:
+            def func(x):
+                return -np.sum(aquisition(x.reshape(shape)))
+        else:
+            def func(x):
+                aquivals, grads = gradient(x.reshape(shape))
+                return -np.sum(aquivals), -grads.ravel()
+
+        result = scipy_minimize(
+            func, starts.ravel(),
+            jac = gradient is not None,
+            method = 'L-BFGS-B',
+            bounds = bounds * shape[0],
+            options = {'maxiter' : self.max_iter})
+
+        candidates = [instances[order[0]]]
+        candidates += minimizer.back_transform_batch(result.x.reshape(shape))
+
+        values = aquisition(minimizer.transform_batch(candidates))
+        index = np.argmax(values)
+        return candidates[index], values[index]
+
+
+class MinimizerAquisitionOptimizer(AquisitionOptimizer):
+    """
+    Runs a minimizer class on the aquisition function.
+
+    Instances are evaluated one by one, used for minimizer classes
+    given as aquiopt_cls.
+    """
+
+    def __init__(self, minimizer, minimizer_cls):
+        super().__init__(minimizer)
+        self.minimizer_cls = minimizer_cls
+
+    def maximize(self, aquisition, gradient=None):
+        transform = self.minimizer.transform
+
+        def merrit_func(point):
+            point = np.array(transform(point)).reshape([1,-1])
+            return aquisition(point)[0]
+
+        opt_obj = minimize_func(
+            func = merrit_func,
+            param = quote(self.minimizer.search_space),
+            minimizer = self.minimizer_cls,
+            max_iter = self.minimizer.aq_evaluations,
+        )
+        opt_obj.run()
+
+        instances, aquivals = zip(*opt_obj.minimizer.observers['protocol'])
+        index = np.argmax(aquivals)
+        instance = get_subspace(instances[index], (0, 0)) # remove merrit+quote
+        return instance, aquivals[index]
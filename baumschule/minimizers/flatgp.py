@@ -11,8 +11,12 @@ import GPy
 from ..core.spaces import (
     Primitive, Categorical, Continuous, Discrete, Parameter, quote)
 from ..core.minimizer import (
-    SequentialMinimizer, FlatMinimizer, minimize_func)
+    Minimizer, SequentialMinimizer, FlatMinimizer, minimize_func)
 from .simple import RandomMinimizer
+from .surrogates import IncrementalGP, SparseGP, select_inducing
+from .aquiopt import (
+    RandomAquisitionOptimizer, LBFGSAquisitionOptimizer,
+    MinimizerAquisitionOptimizer)
 from ..core.space_utils import fc_shape, expand, get_crown, get_subspace
 from ..core.random_variables import sample
 from ..core.simplify import simplify
@@ -37,6 +41,12 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
         aquifunc = None,
         kernel = None,
         aquiopt_cls = None,
+        fantasy = 'cl',
+        optimize_every = 10,
+        drift_tolerance = 0.5,
+        surrogate = 'auto',
+        sparse_threshold = 1000,
+        num_inducing = 100,
         ):
         """
         Parameters
@@ -49,7 +59,29 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
             kernel_cls :
                 kernel class (default RBF)
             aquiopt_cls:
-                aquisition function minimizer class (default RandomMinimizer)
+                aquisition function optimizer class, see aquiopt module
+                (default RandomAquisitionOptimizer), minimizer classes
+                are run on the aquisition function instance by instance
+            fantasy : 'cl' or 'kb'
+                performance assumed for pending instances, either the best
+                performance (constant liar) or the predicted mean of the
+                model (kriging believer)
+            optimize_every : int
+                number of new observations after which the kernel
+                hyperparameters are optimised again, in between the
+                model is updated incrementally
+            drift_tolerance : float
+                optimise earlier if the log likelihood per observation
+                changed more than this since the last optimisation
+            surrogate : 'exact', 'sparse' or 'auto'
+                exact Gaussian process, sparse approximation on inducing
+                points or switch to sparse above sparse_threshold
+                observations
+            sparse_threshold : int
+                protocol size above which 'auto' uses the sparse model
+            num_inducing : int
+                number of inducing points of the sparse model, selected
+                from the observed instances
         """
 
         super().__init__(search_space=search_space, engine=engine)
@@ -63,7 +95,9 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
         if kernel == None and self.dim_number:
             kernel = GPy.kern.Bias(self.dim_number) + GPy.kern.RBF(self.dim_number)
         if aquiopt_cls == None:
-            aquiopt_cls = RandomMinimizer
+            aquiopt_cls = RandomAquisitionOptimizer
+        assert fantasy in {'cl', 'kb'}
+        assert surrogate in {'exact', 'sparse', 'auto'}
 
         # create kernel
         """self.kernel = reduce(
@@ -73,6 +107,23 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
         self.kernel = kernel
         self.aquifunc = aquifunc
         self.aquiopt_cls = aquiopt_cls
+        if issubclass(aquiopt_cls, Minimizer):
+            self.aquiopt = MinimizerAquisitionOptimizer(self, aquiopt_cls)
+        else:
+            self.aquiopt = aquiopt_cls(self)
+        self.fantasy = fantasy
+        self.optimize_every = optimize_every
+        self.drift_tolerance = drift_tolerance
+        self.surrogate = surrogate
+        self.sparse_threshold = sparse_threshold
+        self.num_inducing = num_inducing
+        self.model = None
+        self._surrogate = None # model of the protocol without fantasies
+        self._design = [] # transformed instances of the protocol
+        self._targets = [] # performances of the protocol
+        self._optimized_at = 0 # protocol length at last optimisation
+        self._optimized_ll = None # log likelihood per observation
+        self._sparse_noise = 0.0 # noise variance of the sparse model
         self.auto_update = True
         self.best_aquival = None # best aquisition value
         self.best_aqui_instance = None # instance with best aquisition value
@@ -82,19 +133,113 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
 
 
     def fit_model(self):
-        X, Y = zip(*self.observers['protocol'])
-        X = np.array([self.transform(x) for x in X])
-        Y = np.array(Y).reshape(-1, 1)
+        """
+        Returns the surrogate model of the protocol and pending instances.
+
+        Transformed instances are cached, new observations are added with
+        rank-one updates and the kernel is only optimised on schedule
+        (see optimize_every and drift_tolerance).
+        """
+        protocol = self.observers['protocol']
+        records = list(protocol[len(self._design):])
+        if records:
+            instances, perfs = zip(*records)
+            self._design.extend(self.transform_batch(instances))
+            self._targets.extend(perfs)
+
+        surrogate = self._surrogate
+        if surrogate is None:
+            surrogate = self.optimize_model()
+        else:
+            n = surrogate.num_data
+            for x, y in zip(self._design[n:], self._targets[n:]):
+                surrogate.add(x, y)
+            if self.optimization_due(surrogate):
+                surrogate = self.optimize_model()
+        self._surrogate = surrogate
+
+        if self.pending:
+            X = self.transform_batch(self.pending)
+            return surrogate.extended(X, self.fantasize(self.pending))
+        return surrogate
+
+    def use_sparse(self, n):
+        """Whether the surrogate of n observations is sparse."""
+        if self.surrogate == 'auto':
+            return n > self.sparse_threshold
+        return self.surrogate == 'sparse'
+
+    def optimization_due(self, surrogate):
+        n = surrogate.num_data
+        if isinstance(surrogate, SparseGP) != self.use_sparse(n):
+            return True
+        if not self.optimize_kernel:
+            return False
+        if n - self._optimized_at >= self.optimize_every:
+            return True
+        drift = surrogate.log_likelihood() / n - self._optimized_ll
+        return abs(drift) > self.drift_tolerance
+
+    def optimize_model(self):
+        """Optimises the kernel on the protocol and refits the surrogate."""
+        X = np.array(self._design)
+        Y = np.array(self._targets).reshape(-1, 1)
         log.debug('X.shape %s' % (X.shape,))
-        #print('.....', X, self.observers['protocol'])
-        m = GPy.models.GPRegression(X, Y, self.kernel)
-        m.Gaussian_noise.constrain_fixed(0.0)
+
+        if self.use_sparse(len(X)):
+            surrogate = self.optimize_sparse_model(X, Y)
+        else:
+            if self.optimize_kernel:
+                m = GPy.models.GPRegression(X, Y, self.kernel)
+                m.Gaussian_noise.constrain_fixed(0.0)
+                try:
+                    m.optimize()
+                except np.linalg.linalg.LinAlgError as e:
+                    print('Optimization failed:', str(e))
+            surrogate = IncrementalGP(self.kernel, X, Y)
+
+        self._optimized_at = len(X)
+        self._optimized_ll = surrogate.log_likelihood() / len(X)
+        return surrogate
+
+    def optimize_sparse_model(self, X, Y):
+        """
+        Returns a sparse surrogate, the inducing points are spread over the
+        observed instances starting at the best one.
+        """
+        Z = select_inducing(X, self.num_inducing, first=int(np.argmin(Y)))
+        log.debug('%s inducing points' % len(Z))
+
+        # the approximation needs some noise to be numerically stable
+        min_noise = 1e-4 * max(np.var(Y), 1e-6)
+
+        m = GPy.models.SparseGPRegression(X, Y, self.kernel, Z=Z)
+        m.inducing_inputs.fix()
+        m.Gaussian_noise.variance = max(self._sparse_noise, min_noise)
+        m.Gaussian_noise.unconstrain()
+        m.Gaussian_noise.constrain_bounded(min_noise, max(np.var(Y), 1.0))
         if self.optimize_kernel:
             try:
                 m.optimize()
             except np.linalg.linalg.LinAlgError as e:
                 print('Optimization failed:', str(e))
-        return m
+        self._sparse_noise = float(m.Gaussian_noise.variance[0])
+        return SparseGP(self.kernel, Z, X, Y, self._sparse_noise)
+
+    def fantasize(self, instances):
+        """Returns the performances assumed for pending instances."""
+        if self.fantasy == 'kb' and self.model is not None:
+            X = self.transform_batch(instances)
+            mean, _ = self.model.predict(X)
+            return list(mean[:, 0])
+        return [self.best_perf] * len(instances)
+
+    def propose(self, size=1):
+        # one by one, so every proposal sees the fantasies of the former
+        instances = []
+        for _ in range(size):
+            instances += super().propose(1)
+        return instances
 
     def update(self, best_perf=None):
         self.model = self.fit_model()
@@ -102,29 +247,25 @@ class FlatGPMinimizer(FlatMinimizer, SequentialMinimizer):
         if best_perf == None:
             best_perf = self.best_perf
 
-        def merrit_func(point):
-            point = self.transform(point)
-            point = np.array(point).reshape([1,-1])
-            x_mean, x_var = self.model.predict(point)
-            x_mean = x_mean[0][0]
-            x_var = x_var[0][0]
-            return self.aquifunc(x_mean, x_var, best_perf)
-
-        # make this an attribute and add clean function
-        opt_obj = minimize_func(
-            func = merrit_func,
-            param = quote(self.search_space),
-            minimizer = self.aquiopt_cls,
-            max_iter = self.aq_evaluations,
-        )
-        opt_obj.run()
-
-        instances, aquivals = zip(*opt_obj.minimizer.observers['protocol'])
-        index = np.argmax(aquivals)
-        self.best_aquival = aquivals[index]
-        bai = instances[index]
-        bai = get_subspace(bai, (0, 0)) # remove merrit+quote
-        self.best_aqui_instance = bai
+        def aquisition(X):
+            mean, var = self.model.predict(X)
+            return self.aquifunc(mean[:, 0], var[:, 0], best_perf)
+
+        gradient_func = aquifunc_gradients.get(self.aquifunc)
+        if gradient_func and hasattr(self.model, 'predictive_gradients'):
+            def gradient(X):
+                mean, var = self.model.predict(X)
+                dmean, dvar = self.model.predictive_gradients(X)
+                mean, var = mean[:, 0], var[:, 0]
+                da_dmean, da_dvar = gradient_func(mean, var, best_perf)
+                grads = da_dmean[:, None] * dmean[:, :, 0] + da_dvar[:, None] * dvar
+                return self.aquifunc(mean, var, best_perf), grads
+        else:
+            gradient = None
+
+        instance, aquival = self.aquiopt.maximize(aquisition, gradient)
+        self.best_aquival = aquival
+        self.best_aqui_instance = instance
 
 
     def pick_next(self):
@@ -184,6 +325,32 @@ def upper_confidence_bound(mean_Y , var_Y, beta):
     return mean_Y + beta*np.sqrt(var_Y)
 
 
+def expected_improvement_gradient(mean_Y, var_Y, best_y):
+    """Returns the derivatives of EI with respect to mean_Y and var_Y."""
+    s = np.sqrt(var_Y)
+    ratio = (best_y - mean_Y) / s
+    return -stats.norm.cdf(ratio), stats.norm.pdf(ratio) / (2*s)
+
+
+def probability_of_improvement_gradient(mean_Y, var_Y, best_y):
+    """Returns the derivatives of PI with respect to mean_Y and var_Y."""
+    s = np.sqrt(var_Y)
+    ratio = (best_y - mean_Y) / s
+    pdf = stats.norm.pdf(ratio)
+    return -pdf / s, -pdf * ratio / (2*var_Y)
+
+
+def upper_confidence_bound_gradient(mean_Y, var_Y, beta):
+    """Returns the derivatives of UCB with respect to mean_Y and var_Y."""
+    return np.ones_like(mean_Y), beta / (2*np.sqrt(var_Y))
+
+
+aquifunc_gradients = {
+    expected_improvement : expected_improvement_gradient,
+    probability_of_improvement : probability_of_improvement_gradient,
+    upper_confidence_bound : upper_confidence_bound_gradient,
+}
+
 aquifunc_dict = {
     "ucb" :  upper_confidence_bound,
     "ei"  : expected_improvement,
@@ -1,9 +1,11 @@
 
 from time import sleep
+from itertools import islice
 
 from ..core.random_variables import sample
 from ..core.minimizer import SequentialMinimizer
 from ..core.simplify import simplify
+from ..core.iterators import iter_instances, IndexedInstances
 
 
 class RandomMinimizer(SequentialMinimizer):
@@ -17,18 +19,36 @@ class RandomMinimizer(SequentialMinimizer):
         #instance = simplify(instance)
         return instance
 
+    def pick_batch(self, size):
+        return sample(self.search_space, n=size)
+
 
 class ExhaustiveMinimizer(SequentialMinimizer):
     """
     Iterates over all instances of an iterable search space.
 
+    start : int
+        position to start from, e.g. to resume after a crash
+    shard : tuple (i, n)
+        iterates only over the i-th of n parts of the instances, to
+        spread a grid search over several processes or machines
     """
 
-    def __init__(self, search_space, protocol, engine):
-        super().__init__(search_space, protocol, engine)
-        self.iterator = iter(search_space)
+    def __init__(self, search_space, engine=None, start=0, shard=None):
+        super().__init__(search_space, engine)
+        if start or shard:
+            instances = IndexedInstances(search_space)
+            if shard:
+                instances = instances.shard(*shard)
+            self.iterator = iter(instances)
+            self.iterator.seek(start)
+        else:
+            self.iterator = iter_instances(search_space)
 
     def pick_next(self):
         instance = next(self.iterator)
         #instance = simplify(instance)
         return instance
+
+    def pick_batch(self, size):
+        return list(islice(self.iterator, size))
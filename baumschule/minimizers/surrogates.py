@@ -0,0 +1,238 @@
+"""
+Surrogate models for the Gaussian process minimizers.
+"""
+import logging
+from math import inf
+
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from GPy.util.linalg import jitchol
+
+log = logging.getLogger(__name__)
+logging.basicConfig()
+log.setLevel('INFO')
+
+
+class IncrementalGP:
+    """
+    Exact Gaussian process posterior for fixed kernel hyperparameters.
+
+    Observations are added with rank-one updates of the Cholesky factor,
+    which costs O(n²) instead of the O(n³) of a new factorisation.
+    predict has the same interface as for GPy models.
+    """
+
+    def __init__(self, kernel, X, Y, noise_var=0.0, jitter=1e-8):
+        self.kernel = kernel
+        self.noise_var = noise_var
+        self.jitter = jitter
+        self.refit(X, Y)
+
+    @property
+    def num_data(self):
+        return len(self.X)
+
+    def refit(self, X, Y):
+        """Factorises the covariance matrix of all observations anew."""
+        self.X = np.array(X, dtype=float)
+        self.Y = np.array(Y, dtype=float).reshape(-1, 1)
+        K = self.kernel.K(self.X)
+        K[np.diag_indices_from(K)] += self.noise_var + self.jitter
+        self.L = jitchol(K)
+        self.alpha = cho_solve((self.L, True), self.Y)
+
+    def add(self, x, y):
+        """Adds one observation."""
+        x = np.array(x, dtype=float).reshape(1, -1)
+        n = self.num_data
+
+        k = self.kernel.K(self.X, x)[:, 0]
+        kss = self.kernel.K(x)[0, 0] + self.noise_var + self.jitter
+        l = solve_triangular(self.L, k, lower=True)
+        d = kss - l @ l
+
+        if d <= 0:
+            # numerically singular, a new factorisation adds more jitter
+            log.debug('rank one update failed, refit')
+            self.refit(np.vstack([self.X, x]), np.append(self.Y, y))
+            return
+
+        L = np.zeros((n + 1, n + 1))
+        L[:n, :n] = self.L
+        L[n, :n] = l
+        L[n, n] = np.sqrt(d)
+
+        self.L = L
+        self.X = np.vstack([self.X, x])
+        self.Y = np.vstack([self.Y, [[y]]])
+        self.alpha = cho_solve((self.L, True), self.Y)
+
+    def extended(self, X, Y):
+        """Returns a copy with additional observations."""
+        model = self.__class__.__new__(self.__class__)
+        model.__dict__.update(self.__dict__)
+        for x, y in zip(X, Y):
+            model.add(x, y)
+        return model
+
+    def predict(self, Xnew):
+        """Returns mean and variance, both of shape (len(Xnew), 1)."""
+        Xnew = np.asarray(Xnew, dtype=float)
+        Ks = self.kernel.K(Xnew, self.X)
+        mean = Ks @ self.alpha
+        v = solve_triangular(self.L, Ks.T, lower=True)
+        var = self.kernel.Kdiag(Xnew) - np.sum(v**2, axis=0) + self.noise_var
+        var = np.clip(var, 1e-12, inf)
+        return mean, var.reshape(-1, 1)
+
+    def predictive_gradients(self, Xnew):
+        """
+        Returns the gradients of mean and variance with respect to Xnew,
+        with shapes (len(Xnew), dim, 1) and (len(Xnew), dim) as GPy does.
+        """
+        Xnew = np.asarray(Xnew, dtype=float)
+        m = len(Xnew)
+        dL_dK = np.repeat(self.alpha.T, m, axis=0)
+        dmean = self.kernel.gradients_X(dL_dK, Xnew, self.X)
+
+        Ks = self.kernel.K(Xnew, self.X)
+        KinvKs = cho_solve((self.L, True), Ks.T)
+        dvar = self.kernel.gradients_X(-2 * KinvKs.T, Xnew, self.X)
+        dvar += self.kernel.gradients_X_diag(np.ones(m), Xnew)
+        return dmean[:, :, None], dvar
+
+    def log_likelihood(self):
+        n = self.num_data
+        return float(
+            - 0.5 * self.Y[:, 0] @ self.alpha[:, 0]
+            - np.sum(np.log(np.diag(self.L)))
+            - 0.5 * n * np.log(2 * np.pi))
+
+
+class SparseGP:
+    """
+    Sparse Gaussian process posterior on fixed inducing points (DTC).
+
+    Only the m×m statistics of the observations are stored, so adding an
+    observation and predicting cost O(m²) and O(m³) independent of the
+    number of observations. Has the same interface as IncrementalGP.
+    """
+
+    def __init__(self, kernel, Z, X, Y, noise_var=1e-6, jitter=1e-8):
+        self.kernel = kernel
+        self.Z = np.array(Z, dtype=float)
+        self.noise_var = noise_var
+        self.jitter = jitter
+        self.refit(X, Y)
+
+    @property
+    def num_data(self):
+        return self._n
+
+    def refit(self, X, Y):
+        """Computes the statistics of all observations anew."""
+        X = np.array(X, dtype=float)
+        Y = np.array(Y, dtype=float).reshape(-1, 1)
+        Kmm = self.kernel.K(self.Z)
+        Kmm[np.diag_indices_from(Kmm)] += self.jitter
+        Kmn = self.kernel.K(self.Z, X)
+        self.Lm = jitchol(Kmm)
+        self.A = Kmm + Kmn @ Kmn.T / self.noise_var
+        self.b = Kmn @ Y / self.noise_var
+        self._yy = float(Y[:, 0] @ Y[:, 0])
+        self._n = len(X)
+        self._factorize()
+
+    def _factorize(self):
+        self.LA = jitchol(self.A)
+        self.w = cho_solve((self.LA, True), self.b)
+
+    def add(self, x, y):
+        """Adds one observation."""
+        x = np.array(x, dtype=float).reshape(1, -1)
+        k = self.kernel.K(self.Z, x)
+        self.A = self.A + k @ k.T / self.noise_var
+        self.b = self.b + k * (y / self.noise_var)
+        self._yy += y * y
+        self._n += 1
+        self.LA = cholupdate(self.LA, k[:, 0] / np.sqrt(self.noise_var))
+        self.w = cho_solve((self.LA, True), self.b)
+
+    def extended(self, X, Y):
+        """Returns a copy with additional observations."""
+        model = self.__class__.__new__(self.__class__)
+        model.__dict__.update(self.__dict__)
+        for x, y in zip(X, Y):
+            model.add(x, y)
+        return model
+
+    def predict(self, Xnew):
+        """Returns mean and variance, both of shape (len(Xnew), 1)."""
+        Xnew = np.asarray(Xnew, dtype=float)
+        Ksm = self.kernel.K(Xnew, self.Z)
+        mean = Ksm @ self.w
+        vm = solve_triangular(self.Lm, Ksm.T, lower=True)
+        vA = solve_triangular(self.LA, Ksm.T, lower=True)
+        var = (self.kernel.Kdiag(Xnew) - np.sum(vm**2, axis=0)
+            + np.sum(vA**2, axis=0) + self.noise_var)
+        var = np.clip(var, 1e-12, inf)
+        return mean, var.reshape(-1, 1)
+
+    def predictive_gradients(self, Xnew):
+        """
+        Returns the gradients of mean and variance with respect to Xnew,
+        with shapes (len(Xnew), dim, 1) and (len(Xnew), dim) as GPy does.
+        """
+        Xnew = np.asarray(Xnew, dtype=float)
+        m = len(Xnew)
+        dL_dK = np.repeat(self.w.T, m, axis=0)
+        dmean = self.kernel.gradients_X(dL_dK, Xnew, self.Z)
+
+        Kms = self.kernel.K(self.Z, Xnew)
+        BKms = cho_solve((self.Lm, True), Kms) - cho_solve((self.LA, True), Kms)
+        dvar = self.kernel.gradients_X(-2 * BKms.T, Xnew, self.Z)
+        dvar += self.kernel.gradients_X_diag(np.ones(m), Xnew)
+        return dmean[:, :, None], dvar
+
+    def log_likelihood(self):
+        n = self.num_data
+        quad = self._yy / self.noise_var - float(self.b[:, 0] @ self.w[:, 0])
+        logdet = (n * np.log(self.noise_var)
+            + 2 * np.sum(np.log(np.diag(self.LA)))
+            - 2 * np.sum(np.log(np.diag(self.Lm))))
+        return float(-0.5 * quad - 0.5 * logdet - 0.5 * n * np.log(2 * np.pi))
+
+
+def cholupdate(L, v):
+    """
+    Returns the lower Cholesky factor of L Lᵀ + v vᵀ in O(m²) time.
+    """
+    L = L.copy()
+    v = v.copy()
+    for i in range(len(v)):
+        r = np.hypot(L[i, i], v[i])
+        c, s = r / L[i, i], v[i] / L[i, i]
+        L[i, i] = r
+        L[i+1:, i] = (L[i+1:, i] + s * v[i+1:]) / c
+        v[i+1:] = c * v[i+1:] - s * L[i+1:, i]
+    return L
+
+
+def select_inducing(X, num_inducing, first=0):
+    """
+    Greedily selects rows of X that are far apart from each other.
+
+    Starts with row first and adds the row with the largest distance to
+    the rows selected so far, until num_inducing rows are selected.
+    """
+    X = np.asarray(X, dtype=float)
+    num_inducing = min(num_inducing, len(X))
+    indices = [first]
+    dist = np.sum((X - X[first])**2, axis=1)
+    for _ in range(num_inducing - 1):
+        index = int(np.argmax(dist))
+        if dist[index] == 0:
+            break
+        indices.append(index)
+        dist = np.minimum(dist, np.sum((X - X[index])**2, axis=1))
+    return X[indices]
@@ -22,8 +22,8 @@ default_av = 1. # aqisition value for unseen expansions
 
 class TreeGPMinimizer(SequentialMinimizer):
 
-    def __init__(self, search_space, threshold=1.0, aquifunc='ei'):
-        super().__init__(search_space)
+    def __init__(self, search_space, threshold=1.0, aquifunc='ei', engine=None):
+        super().__init__(search_space, engine)
         self.root = Node(search_space, threshold, self, aquifunc)
         self.aquifunc = aquifunc
 
@@ -50,6 +50,10 @@ class TreeGPMinimizer(SequentialMinimizer):
 
         return result
 
+    def compute_batch(self, size):
+        # the tree is updated after every evaluation
+        return [self.compute_next() for _ in range(size)]
+
 
 class Node:
     def __init__(self, search_space, threshold, parent, aquifunc=None):
@@ -63,6 +67,7 @@ class Node:
         self.aquival = threshold # aquisition value
         self.aqui_indices = [] # stores expansion candidates
         self.parent = parent
+        self.engine = parent.engine
         if aquifunc == None:
             self.aquifunc = parent.aquifunc
         else:
@@ -121,6 +126,7 @@ class Leaf:
         if minimizer is None:
             minimizer = FlatGPMinimizer(
                 search_space=search_space,
+                engine=parent.engine,
                 aquifunc=self.aquifunc)
 
         minimizer.auto_update = False
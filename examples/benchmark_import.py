@@ -0,0 +1,30 @@
+"""
+Time of import baumschule in a fresh interpreter.
+
+Heavy dependencies (GPy, scipy, pandas, graphviz) should only be imported
+when they are used, the modules that are still imported are listed.
+"""
+import sys
+import subprocess
+
+code = '''
+import sys, time
+start = time.perf_counter()
+import baumschule
+print(time.perf_counter() - start)
+heavy = ('GPy', 'scipy', 'pandas', 'graphviz', 'IPython', 'matplotlib')
+print(' '.join(m for m in heavy if m in sys.modules))
+'''
+
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+times = []
+for _ in range(repeats):
+    out = subprocess.run(
+        [sys.executable, '-c', code],
+        stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    seconds, heavy = (out.split('\n') + [''])[:2]
+    times.append(float(seconds))
+
+print('import baumschule: %.1f ms (best of %s)' % (1000 * min(times), repeats))
+print('heavy modules imported: %s' % (heavy or 'none'))
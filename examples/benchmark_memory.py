@@ -0,0 +1,33 @@
+"""
+Memory per sampled instance.
+
+Samples instances of a few search spaces and measures the memory they
+hold with tracemalloc, run it before and after changes to the node
+classes to compare.
+"""
+import gc
+import sys
+import tracemalloc
+
+from baumschule import *
+
+# %% search spaces
+f = op(max, 'f')
+spaces = {
+    'flat, args' : f(convert({1, 2, 3}), convert(N[0:10]), convert(R[0:1])),
+    'flat, kwargs' : f(a=convert({1, 2, 3}), b=convert(N[0:10]), c=convert(R[0:1])),
+    'nested' : f(f(convert({1, 2, 3}), convert(R[0:1])), f(convert(N[0:10]), 1)),
+}
+
+# %% measure
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+for name, space in spaces.items():
+    sample(space) # compile the sampler before measuring
+    gc.collect()
+    tracemalloc.start()
+    instances = sample(space, n=n)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('%-14s %6.0f bytes per instance' % (name, size / n))
+    del instances
@@ -0,0 +1,71 @@
+"""
+Tree functions on trees with 10k nodes.
+
+A balanced tree and a chain as deep as the samples of recursive grammars
+like the kernel grammar get (G <<= K+G | K*G | K). Run it before and after
+changes to the traversals, functions that hit the recursion limit are
+reported as failed.
+"""
+import sys
+import time
+import operator
+
+from baumschule import *
+from baumschule.core.space_utils import fc_shape, expand
+from baumschule.core.to_graphviz import todot
+
+add = op(operator.add, 'add')
+mul = op(operator.mul, 'mul')
+
+# %% trees
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+def balanced(n):
+    if n <= 1:
+        return 1
+    return add(balanced(n // 2), balanced(n - n // 2 - 1))
+
+def chain(n):
+    tree = 1
+    for i in range(n // 2):
+        tree = (add if i % 2 else mul)(tree, 1)
+    return tree
+
+def choices(n):
+    tree = join(1, 2)
+    for _ in range(n // 4):
+        tree = add(tree, join(1, 2))
+    return tree
+
+trees = {
+    'balanced' : balanced(n // 2),
+    'deep' : chain(n),
+}
+
+functions = {
+    'compute' : compute,
+    'serialize' : serialize,
+    'pformat' : lambda tree : pformat(tree, linebreaks=False),
+    'simplify' : simplify,
+    'is_recursive' : is_recursive,
+    'todot' : todot,
+}
+
+# %% measure
+def measure(func, arg):
+    start = time.perf_counter()
+    try:
+        func(arg)
+    except RecursionError:
+        return 'RecursionError'
+    return '%8.1f ms' % (1000 * (time.perf_counter() - start))
+
+for name, tree in trees.items():
+    for fname, func in functions.items():
+        print('%-9s %-13s %s' % (name, fname, measure(func, tree)))
+
+space = choices(n)
+print('%-9s %-13s %s' % ('choices', 'fc_shape', measure(fc_shape, space)))
+indices = [0] * (n // 4 + 1)
+print('%-9s %-13s %s' % (
+    'choices', 'expand', measure(lambda s : expand(s, indices), space)))
@@ -1,8 +1,84 @@
 import pytest
-from treefarm import *
+from baumschule import *
 
 def test_add():
     assert compute(sample(join(3) + join(5))) == 8
 
 def test_mul():
     assert compute(sample(join(10) * join(4))) == 40 
+
+def test_pool_batch():
+    instances = sample(join(3, 4) * join(5, 6), n=20)
+    expected = [compute(x) for x in instances]
+    with ThreadPoolEngine(4) as engine:
+        assert engine.evaluate_batch(instances) == expected
+    with ProcessPoolEngine(2) as engine:
+        assert engine.evaluate_batch(instances) == expected
+
+def test_caching_engine(tmp_path):
+    calls = []
+    def slow_square(x):
+        calls.append(x)
+        return x**2
+    square = op(slow_square, 'square')
+    noisy = op(lambda x : x, 'noisy', pure=False)
+
+    engine = CachingEngine()
+    assert engine.evaluate(square(3) + square(3)) == 18
+    assert engine.evaluate(square(3)) == 9
+    assert calls == [3]
+    assert engine.evaluate(noisy(square(3))) == 9
+    assert engine.key(noisy(square(3))) is None
+
+    from baumschule.core.computing_engine import EvaluationCache
+    path = str(tmp_path / 'cache')
+    engine = CachingEngine(EvaluationCache(maxsize=1, path=path))
+    engine.evaluate(square(4))
+    engine.evaluate(square(5))
+    assert len(engine.cache) == 1
+    assert engine.evaluate(square(4)) == 16
+    assert calls == [3, 4, 5]
+
+def test_closures_are_not_confused():
+    from baumschule.core.hashing import structural_eq
+
+    def make(n):
+        def times(x):
+            return n * x
+        return op(times, 'times')
+
+    engine = CachingEngine()
+    assert engine.evaluate(make(2)(5)) == 10
+    assert engine.evaluate(make(3)(5)) == 15
+    assert engine.evaluate(op(lambda x : x + 1, 'g')(5)) == 6
+    assert engine.evaluate(op(lambda x : x + 2, 'g')(5)) == 7
+    assert not structural_eq(make(2)(5), make(3)(5))
+
+    # importable functions are still hashed by name
+    assert structural_eq(op(abs, 'abs')(-1), op(abs, 'abs')(-1))
+
+def test_compiled_plan():
+    from baumschule.core.computing_engine import SimpleEngine
+    def collect(*args, **kwargs):
+        return args, kwargs
+    f = op(collect, 'collect')
+    space = f(join(3, 4) * convert(R[0:1]), prod(join(5, 6), 7),
+        y=join(8, quote(1)), z=convert({'a', 'b'}))
+
+    engine = SimpleEngine()
+    plan = engine.compile(space)
+    for x in sample(space, n=50):
+        assert plan(x) == engine.evaluate(x)
+    assert engine.compile(sample(space))() is not None
+
+
+def test_keyword_order():
+    def pair(a, b):
+        return a, b
+    f = op(pair, 'pair')
+    x = f(b=1, a=2)
+    assert compute(x) == (2, 1)
+    assert CachingEngine().evaluate(x) == (2, 1)
+    with ThreadPoolEngine(max_workers=2) as engine:
+        assert engine.evaluate_batch([x, f(b=3, a=f(b=4, a=5))]) == [
+            (2, 1), ((5, 4), 3)]
@@ -1,6 +1,6 @@
 from math import inf
 import pytest
-from treefarm.core.domains import ParameterList, Interval, R, N, Z
+from baumschule.core.domains import ParameterList, Interval, R, N, Z
 
 A = Interval(-12.6, 18.5, 0.1, False, True)
 B = Interval(-12.6, 18.5, 0.1, True, False)
@@ -41,3 +41,48 @@ def test_contains():
 def test_iter():
     for i, j in enumerate(N[:10], 1):
         assert i == j
+
+def test_grid():
+    # every point of a float grid is found, not only those without
+    # rounding errors in (x - start) / step
+    points = [round(-12.5 + k / 10, 1) for k in range(310)]
+    assert all(x in A for x in points)
+    assert A.contains_many(points).all()
+
+    x = [18.5, 1.1, -12.6, 0.11, inf, 18.6]
+    assert A.contains_many(x).tolist() == [i in A for i in x]
+    assert A.snap(x[:5]).tolist() == [18.5, 1.1, -12.5, 0.1, 18.5]
+    assert N.snap(-3) == 1
+    assert R[0:1].snap(2.5) == 1
+
+    assert Interval(0, 1, 0.1) in Interval(-1, 2, 0.05)
+    assert Interval(0, 1, 0.15) not in Interval(-1, 2, 0.1)
+
+def test_grid_iter():
+    values = list(A)
+    assert len(values) == A.len() == 311
+    assert values[0] == A[0] == -12.5
+    assert values[-1] == A[-1] == 18.5
+    assert values[137] == 1.2
+    assert all(A.index_of(x) == k for k, x in enumerate(values))
+    with pytest.raises(ValueError):
+        A.index_of(0.11)
+    with pytest.raises(IndexError):
+        A[311]
+
+    assert list(N[0:5]) == [0, 1, 2, 3, 4]
+    assert N[0:5].len() == 5
+    assert N[0:10:3].len() == 4
+    assert N.len() == inf
+
+    import numpy as np
+    assert np.asarray(A).tolist() == values
+    assert np.asarray(N[0:5]).dtype.kind == 'i'
+
+def test_grid_sample():
+    from baumschule import Discrete, sample
+    dom = Interval(0, 1, 0.25, True, True)
+    values = sample(Discrete(dom), n=200)
+    assert set(values) <= set(dom)
+    assert all(type(x) is float for x in values)
+    assert set(sample(Discrete(N[0:5]), n=200)) <= set(range(5))
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+from baumschule import *
+from baumschule.core.environment import (
+    compile_file, config_snapshot, restore_config, share_config,
+    unshare_config, CONFIG_SNAPSHOT_VARIABLE, _code_cache)
+
+
+def test_config_snapshot(tmp_path):
+    conf = get_config()
+    snapshot = config_snapshot()
+    assert snapshot is not None
+    assert not hasattr(conf, 'no_such_option')
+
+    # worker processes get the values by value
+    default_source = conf.datasets.local_default_source
+    conf.datasets.local_default_source = 'changed'
+    subgroup = conf.datasets
+    try:
+        restore_config(snapshot)
+        assert conf.datasets is subgroup
+        assert subgroup.local_default_source == default_source
+    finally:
+        conf.datasets.local_default_source = default_source
+
+    # compiled code is cached on disk
+    filename = str(tmp_path / 'a.conf.py')
+    with open(filename, 'w') as f:
+        f.write('x = 1\n')
+    code = compile_file(filename, cache_folder=str(tmp_path / 'cache'))
+    del _code_cache[filename]
+    assert compile_file(filename, cache_folder=str(tmp_path / 'cache')) == code
+    with open(filename, 'w') as f:
+        f.write('x = 22\n')
+    glob = {}
+    exec(compile_file(filename, cache_folder=str(tmp_path / 'cache')), glob)
+    assert glob['x'] == 22
+
+    # the cache is skipped if its folder can't be written
+    blocked = str(tmp_path / 'a.conf.py' / 'cache')
+    del _code_cache[filename]
+    assert compile_file(filename, cache_folder=blocked) is not None
+
+
+def test_shared_config():
+    conf = get_config()
+    default_source = conf.datasets.local_default_source
+    conf.datasets.local_default_source = 'shared'
+    code = (
+        'import baumschule\n'
+        'from baumschule.core.environment import _code_cache\n'
+        'c = baumschule.get_config()\n'
+        'print(c.datasets.local_default_source)\n'
+        'print(any(".conf.py" in f for f in _code_cache))\n')
+    cwd = os.path.dirname(os.path.dirname(__file__))
+
+    def run(code):
+        return subprocess.run([sys.executable, '-c', code],
+            stdout=subprocess.PIPE, check=True, universal_newlines=True,
+            cwd=cwd).stdout.split()
+
+    try:
+        share_config()
+        # a child process loads the values and executes no config file
+        assert run(code) == ['shared', 'False']
+        # its children don't
+        nested = 'import subprocess, sys; subprocess.run([sys.executable, "-c", %r])'
+        assert run(nested % code) == [default_source, 'True']
+        unshare_config()
+        assert CONFIG_SNAPSHOT_VARIABLE not in os.environ
+
+        # pools share the configuration until shutdown
+        with ProcessPoolEngine(max_workers=1) as engine:
+            assert engine.evaluate(get_env().add(1, 2)) == 3
+            assert CONFIG_SNAPSHOT_VARIABLE in os.environ
+        assert CONFIG_SNAPSHOT_VARIABLE not in os.environ
+    finally:
+        conf.datasets.local_default_source = default_source
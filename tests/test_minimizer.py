@@ -0,0 +1,149 @@
+import pytest
+from baumschule import *
+from baumschule.minimizers import RandomMinimizer
+
+
+def square(x):
+    return x**2
+
+
+def test_propose_tell():
+    space = op(square)(convert(R[-1:1]))
+    minimizer = RandomMinimizer(space)
+    instances = minimizer.propose(3)
+    assert minimizer.pending == instances
+    for x in instances:
+        minimizer.tell(x, compute(x))
+    assert minimizer.pending == []
+    assert len(minimizer.protocol) == 3
+    assert minimizer.best_perf == min(perf for _, perf in minimizer.protocol)
+
+
+def test_async_minimization():
+    space = op(square)(convert(R[-1:1]))
+    with ThreadPoolEngine(4) as engine:
+        m = minimize(space, max_iter=20, minimizer='random', engine=engine,
+            in_flight=4)
+        m.run()
+    assert m.iteration == 20
+    assert len(m.observers['standard']) == 20
+    assert m.minimizer.pending == []
+
+
+def test_incremental_gp():
+    import numpy as np
+    import GPy
+    from baumschule.minimizers.surrogates import IncrementalGP
+
+    kernel = GPy.kern.Bias(2) + GPy.kern.RBF(2)
+    X = np.random.rand(20, 2)
+    Y = np.sin(X.sum(axis=1))
+    model = IncrementalGP(kernel, X[:5], Y[:5])
+    for x, y in zip(X[5:], Y[5:]):
+        model.add(x, y)
+    full = IncrementalGP(kernel, X, Y)
+
+    Xnew = np.random.rand(5, 2)
+    for a, b in zip(model.predict(Xnew), full.predict(Xnew)):
+        assert np.allclose(a, b)
+    assert np.isclose(model.log_likelihood(), full.log_likelihood())
+
+
+def test_sparse_gp():
+    import numpy as np
+    import GPy
+    from baumschule.minimizers.surrogates import IncrementalGP, SparseGP
+
+    # with all observations as inducing points the posterior is exact
+    kernel = GPy.kern.RBF(2)
+    X = np.random.rand(10, 2)
+    Y = np.sin(X.sum(axis=1))
+    model = SparseGP(kernel, X, X[:5], Y[:5], noise_var=0.01)
+    for x, y in zip(X[5:], Y[5:]):
+        model.add(x, y)
+    full = IncrementalGP(kernel, X, Y, noise_var=0.01)
+
+    Xnew = np.random.rand(5, 2)
+    for a, b in zip(model.predict(Xnew), full.predict(Xnew)):
+        assert np.allclose(a, b)
+    assert np.isclose(model.log_likelihood(), full.log_likelihood())
+    assert np.allclose(model.LA, np.linalg.cholesky(model.A))
+
+
+def test_back_transform():
+    from baumschule.core.minimizer import FlatMinimizer
+
+    def f(x, c, k):
+        return x
+
+    space = op(f)(convert(R[-1:1]), c=convert({'a', 'b', 'c'}),
+        k=convert(N[0:10]))
+    minimizer = FlatMinimizer(space)
+    for instance in sample(space, n=10):
+        x = minimizer.transform(instance)
+        assert serialize(minimizer.back_transform(x)) == serialize(instance)
+
+
+def test_encoding():
+    from baumschule.core.encoding import Encoding
+
+    def f(x, c, k, m):
+        return x
+
+    space = op(f)(convert(R[-1:1]), c=convert({'a', 'b', 'c'}),
+        k=convert(Interval(0, 1, 0.25, True, True)), m=join(1, 2))
+    encoding = Encoding(space, scale=True)
+    assert encoding.width == 6
+    assert encoding.bounds() == [(0, 1)] * 6
+
+    instances = sample(space, n=20)
+    X = encoding.encode(instances)
+    assert X.shape == (20, 6)
+    assert ((0 <= X) & (X <= 1)).all()
+    for x, y in zip(instances, encoding.decode(X)):
+        assert structural_eq(x.domain['k'], y.domain['k'])
+        assert x.domain['c'] == y.domain['c'] and x.domain['m'] == y.domain['m']
+
+    # relaxed values are decoded to the nearest valid ones
+    y, = encoding.decode([[1.5, 0.2, 0.9, 0.1, 0.4, 0.8]])
+    assert serialize(y) == "f(1.0, c=%r, k=0.5, m=2)" % list(space.domain['c'].domain)[1]
+
+
+def test_encoding_join_children():
+    from baumschule.core.encoding import Encoding
+
+    def f(a, b=0):
+        return a
+
+    space = op(f)(convert(N[0:10]),
+        b=join(op(f)(1, 2), convert(R[0:1]), 7, op(f)(convert({'x', 'y'}))))
+    encoding = Encoding(space)
+    instances = sample(space, n=40)
+    X = encoding.encode(instances)
+    for x, y in zip(instances, encoding.decode(X)):
+        # children without choice points are decoded to themselves
+        if serialize(x.domain['b']) in ('7', 'f(1, 2)'):
+            assert structural_eq(x, y)
+
+    # children with choice points are decoded to valid instances
+    for k in range(4):
+        y, = encoding.decode([[0, k]])
+        assert encoding.encode([y])[0, 1] == k
+
+
+def test_auto_minimizer():
+    from baumschule.minimizers import ExhaustiveMinimizer
+
+    finite = op(square)(convert(N[0:5]))
+    m = minimize(finite, minimizer='auto')
+    assert type(m.minimizer) is ExhaustiveMinimizer
+    m.run()
+    assert m.minimizer.best_perf == 0
+
+    infinite = op(square)(convert(R[-1:1]))
+    m = minimize(infinite, minimizer='auto', max_iter=5)
+    assert type(m.minimizer) is not ExhaustiveMinimizer
+    m.run()
+    assert m.iteration == 5
+    assert type(minimize(infinite, minimizer='auto').minimizer) \
+        is not ExhaustiveMinimizer
@@ -0,0 +1,105 @@
+import pickle
+from baumschule.core.protocol import (
+    SimpleProtocol, StandardProtocol, ColumnarProtocol)
+
+
+def test_columnar_protocol():
+    standard = StandardProtocol()
+    columnar = ColumnarProtocol(capacity=2)
+    perfs = [3., 1., 4., 1., 5., 9., 2., 6.]
+    for i, perf in enumerate(perfs):
+        record = dict(instance_str='x%s' % (i % 3), start_ts=i,
+            select_time=.1, comp_time=.2, perf=perf)
+        standard.write(**record)
+        columnar.write(**record)
+
+    assert list(columnar) == list(standard)
+    assert columnar[-1] == standard[-1]
+    assert columnar.get_min() == standard.get_min()
+    assert columnar.get_max().perf == 9.
+    assert list(columnar.minium_perfs()) == [3., 1., 1., 1., 1., 1., 1., 1.]
+    assert list(columnar.to_dataframe()['name']) == [r.name for r in standard]
+
+    copy = pickle.loads(pickle.dumps(columnar))
+    assert list(copy) == list(columnar)
+    copy.write('y', 0., 0., 0., 0.)
+    assert copy.get_min().name == 'y'
+
+
+def test_simple_protocol_best():
+    protocol = SimpleProtocol()
+    for instance, perf in [('a', 2), ('b', 1), ('c', 1)]:
+        protocol.write(instance, perf)
+    assert protocol.get_min() == (('b', 1), ('c', 1))
+    assert protocol.get_max() == (('a', 2),)
+
+
+def square(x):
+    return x**2
+
+
+def test_journal_resume(tmp_path):
+    from baumschule import op, convert, minimize, R
+    from baumschule.core.protocol import read_journal
+
+    space = op(square)(convert(R[-1:1]))
+    path = str(tmp_path / 'run.journal')
+    m = minimize(space, max_iter=10, minimizer='random', journal=path)
+    m.run()
+    assert len(read_journal(path)) == 10
+
+    # a record cut off by a crash is dropped
+    with open(path, 'r+b') as f:
+        f.truncate(len(f.read()) - 1)
+    m = minimize(space, max_iter=15, minimizer='random', journal=path,
+        resume=True)
+    assert m.iteration == 9
+    assert len(m.minimizer.protocol) == 9
+    assert m.minimizer.best_perf == min(r['perf'] for r in read_journal(path))
+    m.run()
+    assert len(read_journal(path)) == 15
+
+
+def test_journal_errors(tmp_path):
+    import pytest
+    from baumschule import op, convert, sample, R
+    from baumschule.core.protocol import Journal
+
+    path = tmp_path / 'sub' / 'run.journal'
+    journal = Journal(str(path))
+    assert not path.exists()
+
+    g = op(lambda x: x, 'g')
+    x = sample(op(square)(g(convert(R[0:1]))))
+    with pytest.raises(pickle.PicklingError, match='lambda'):
+        journal.write(x, str(x), 0., 0., 0., 1.)
+    journal.write(1, '1', 0., 0., 0., 1.)
+    journal.close()
+    assert path.exists()
+
+
+def failing(x):
+    if x > 2:
+        raise RuntimeError('objective failed')
+    return x
+
+
+def test_journal_flush(tmp_path):
+    import pytest
+    from baumschule import op, convert, minimize, N
+    from baumschule.core.protocol import Journal, read_journal
+
+    # slow objectives: records are written once fsync_interval passed
+    path = str(tmp_path / 'slow.journal')
+    journal = Journal(path, flush_every=100, fsync_interval=0.)
+    journal.write(1, '1', 0., 0., 0., 1.)
+    assert len(read_journal(path)) == 1
+
+    # records are written when an objective fails
+    path = str(tmp_path / 'failing.journal')
+    space = op(failing)(convert(N[0:10]))
+    m = minimize(space, max_iter=10, minimizer='exhaustive', journal=path,
+        in_flight=2)
+    with pytest.raises(RuntimeError):
+        m.run()
+    assert {0, 1} <= {r['perf'] for r in read_journal(path)} <= {0, 1, 2}
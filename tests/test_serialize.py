@@ -0,0 +1,32 @@
+import pytest
+from baumschule import *
+from baumschule.core.serialize import parse, dumps, loads
+from baumschule.core.hashing import structural_eq
+
+
+def test_round_trip():
+    env = get_env()
+    space = prod(
+        env.add(env.mul(convert(R[0:1]), convert({1, 2})), -3),
+        env.tuple(convert({'a', 'b'}), None, True, 1e300, 2**70, [1, 'x'],
+            x=env.list(convert(N[0:9]), 'q"\'z')),
+        join(env.sub(1, 2), 3))
+
+    for x in sample(space, n=20):
+        text = serialize(x)
+        assert serialize(parse(text)) == text
+        assert structural_eq(parse(text), x)
+        assert structural_eq(loads(dumps(x)), x)
+
+    assert parse("add(1, 'a')").operation is env.add
+    assert loads(dumps('a')) == 'a'
+    assert compute(loads(dumps(env.add(2, 3.5)))) == 5.5
+    with pytest.raises(KeyError):
+        parse('unknown_operation(1)')
+
+    # strings were written unquoted before
+    old = parse('tuple(a, 1, add, x=b)')
+    assert structural_eq(old, env.tuple('a', 1, env.add, x='b'))
+    assert serialize(old) == "tuple('a', 1, add, x='b')"
+    with pytest.raises(ValueError):
+        parse('add(1')
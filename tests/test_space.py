@@ -1,5 +1,5 @@
 import pytest
-from treefarm import *
+from baumschule import *
 
 def test_join_sample():
     dom_a = {'a', 'b', 'c'}
@@ -10,3 +10,189 @@ def test_join_sample():
     for _ in range(10):
         x = sample(c)
         assert x in [*dom_a, 0,1,2,3,4]
+
+def test_batch_sample():
+    c = join(convert({'a', 'b'}), convert(N[0:5]))
+    xs = sample(c, n=100)
+    assert len(xs) == 100
+    for x in xs:
+        assert x in ['a', 'b', 0, 1, 2, 3, 4]
+
+    cols = sample(prod(convert(R[0:1]), convert(N[0:5])), n=10, columnar=True)
+    assert cols.shape == (10, 2)
+    assert ((0 <= cols[:, 0]) & (cols[:, 0] <= 1)).all()
+
+def test_compiled_sampler_cache():
+    G = join(1)
+    sampler = compile_sampler(G)
+    assert compile_sampler(G) is sampler
+    assert set(sampler(20)) == {1}
+    G <<= 2
+    assert compile_sampler(G) is not sampler
+    assert set(sample(G, n=200)) == {1, 2}
+
+def test_structural_hash():
+    from baumschule.core.hashing import structural_hash, structural_eq
+    from baumschule.core.simplify import simplify
+
+    assert structural_eq(convert(R[0:1]), convert(R[0:1]))
+    assert not structural_eq(convert(R[0:1]), convert(R[0:2]))
+    assert not structural_eq(join(1), join('1'))
+    x = convert(R[0:1])
+    assert len(simplify(join(x, convert(R[0:1]), x)).domain) == 1
+
+    G = join(1)
+    digest = structural_hash(G)
+    G <<= G + G
+    assert structural_hash(G) != digest
+    assert structural_hash(G) == structural_hash(G)
+
+def test_interning():
+    f = op(max, 'f')
+    space = f(convert({1, 2}), x=f(convert({'a'}), 0))
+    with interning():
+        instances = sample(space, n=20)
+    assert len({id(x) for x in instances}) == 2
+    assert instances[0].domain['x'] is instances[1].domain['x']
+    with pytest.raises(TypeError):
+        instances[0] <<= 1
+    assert sample(space) is not sample(space)
+
+def test_interning_keys():
+    f = op(max, 'f')
+    with interning():
+        a, b = sample(f(convert({0.0})), n=2)
+        c = sample(f(convert({-0.0})))
+        d, e = sample(f(convert({(1,)}))), sample(f(convert({(1.0,)})))
+    assert a is b
+    assert str(c.domain[0]) == '-0.0'
+    assert type(e.domain[0][0]) is float and d is not e
+
+def test_sampled_instances_are_frozen():
+    f = op(max, 'f')
+    x = sample(f(convert({1, 2}), 3))
+    with pytest.raises(TypeError, match='immutable'):
+        x <<= 4
+    y = Apply(x.operation, ParameterList(list(x.domain.args), {}))
+    y <<= 4
+    assert compute(y) == 4
+
+def add_kw(x, y):
+    return x + y
+
+
+def test_compact_nodes():
+    import pickle
+    f = op(add_kw)
+    x = sample(f(convert({1, 2}), y=convert(R[0:1])))
+    assert not hasattr(x, '__dict__')
+    with pytest.raises(TypeError):
+        x.domain.append(3)
+    y = pickle.loads(pickle.dumps(x))
+    assert compute(y) == compute(x)
+    assert ParameterList([1], {}).kwargs is ParameterList([2], {}).kwargs
+
+def test_indexed_instances():
+    from baumschule.core.iterators import iter_instances, IndexedInstances
+    from baumschule.core.hashing import structural_eq
+
+    f = op(add_kw)
+    space = join(f(convert(['a', 'b']), y=convert(['c', 'd', 'e'])),
+                 convert(N[0:5]), 'z')
+    instances = IndexedInstances(space)
+    expected = list(iter_instances(space))
+    assert len(instances) == len(expected)
+    for x, y in zip(instances, expected):
+        assert structural_eq(x, y)
+    assert structural_eq(instances[-1], expected[-1])
+
+    shards = [instances.shard(i, 3) for i in range(3)]
+    assert sum(map(len, shards)) == len(instances)
+    assert [compute(x) for s in shards for x in s] == list(map(compute, expected))
+
+    it = iter(instances)
+    it.seek(4)
+    assert structural_eq(next(it), expected[4])
+    with pytest.raises(ValueError):
+        IndexedInstances(convert(R[0:1]))
+
+def test_instance_order_across_processes():
+    import os, sys, subprocess
+    code = '''if True:
+        from baumschule import op, convert, serialize, N
+        from baumschule.core.iterators import IndexedInstances
+        space = op(max)(convert({'a', 'b', 'c', 'd'}), convert(N[0:3]),
+            convert({'e', 'f', op(min)(convert({'g', 'h'}), 1)}))
+        print([serialize(x) for x in IndexedInstances(space).shard(0, 3)])
+    '''
+    outputs = set()
+    for seed in '1', '2', '3':
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        outputs.add(subprocess.check_output([sys.executable, '-c', code],
+            env=env, universal_newlines=True))
+    assert len(outputs) == 1
+
+def test_cardinality():
+    from math import log, inf
+    from baumschule.core.iterators import cardinality, log_cardinality
+
+    f = op(add_kw)
+    space = join(f(convert({1, 2}), y=convert({3, 4, 5})), convert(N[0:4]))
+    assert cardinality(space) == 10
+    assert cardinality(space, max_depth=1) == 4
+    assert cardinality(convert(R[0:1])) == inf
+    assert cardinality(convert(N[0:10**15])) == 10**15
+
+    G = join('x')
+    G <<= join('x', G + G)
+    assert cardinality(G) == inf
+    assert [cardinality(G, d) for d in range(1, 6)] == [1, 2, 2, 3, 6]
+    assert log_cardinality(G, 5) == pytest.approx(log(6))
+    assert log_cardinality(G, 50) < inf
+
+def test_deep_tree():
+    from baumschule.core.space_utils import fc_shape, expand
+    from baumschule.core.hashing import structural_hash
+    tree = join(0)
+    for _ in range(3000):
+        tree = tree + join(1)
+    assert not is_recursive(tree)
+    assert fc_shape(tree) == (1,) * 3001
+    assert serialize(simplify(tree)).count('join') == 3001
+    x = expand(tree, [0] * 3001)
+    assert compute(x) == 3000
+    assert len(structural_hash(x)) == 16
+    assert CachingEngine().evaluate(x) == 3000
+    assert compute(sample(tree)) == 3000
+    assert [compute(x) for x in sample(tree, n=3)] == [3000] * 3
+
+    # deep samples of a recursive grammar, ends with probability 1/1000
+    import numpy as np
+    np.random.seed(0)
+    G = join(0)
+    for _ in range(999):
+        G <<= G + 1
+    assert max(compute(x) for x in sample(G, n=20)) > 1000
+
+def test_keyword_order():
+    from baumschule.core.space_utils import fc_shape, expand, get_crown
+    space = prod(b=join(1, 2), a=join(3, 4, 5))
+    assert fc_shape(space) == (3, 2)
+    assert [len(c.domain) for c in get_crown(space)[0]] == [3, 2]
+    assert serialize(expand(space, [2, 0])) == 'prod(a=5, b=1)'
+    assert serialize(simplify(prod(b=1, a=2))) == 'prod(a=2, b=1)'
+    assert pformat(prod(b=join(1, 2), a={'x'}), linebreaks=False) == \
+        'prod(a={x}, b=Apply(...))'
+
+def test_is_recursive_cached():
+    x = join(1) + 2
+    assert not is_recursive(x)
+    x <<= x + 1
+    assert is_recursive(x)
+    with pytest.raises(ValueError):
+        serialize(x)
+
+def test_star_import():
+    import baumschule
+    assert callable(todot)
+    assert all(hasattr(baumschule, name) for name in baumschule.__all__)